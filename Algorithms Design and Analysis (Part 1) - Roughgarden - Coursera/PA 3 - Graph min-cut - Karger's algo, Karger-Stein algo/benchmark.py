@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the running time and result of the exact Stoer-Wagner algorithm with
+the randomized Karger-Stein algorithm, on graph.txt and on synthetic graphs
+made of two dense random clusters joined by a few edges (so the minimum cut
+is known).
+Usage: python benchmark.py [karger-stein trials]
+"""
+import sys
+import time
+import random
+from mincut import Graph
+
+def two_clusters_graph(n, degree, bridges, rng):
+    """
+    Returns a graph of two clusters of n vertices each, with about 'degree'
+    random edges per vertex inside each cluster, and 'bridges' edges between
+    the clusters.
+    """
+    g = Graph()
+    for offset in (1, n+1):
+        # a cycle keeps each cluster connected
+        for i in xrange(n):
+            g.add_edge(offset + i, offset + (i+1) % n)
+        for i in xrange(n * (degree - 2) // 2):
+            u, v = rng.sample(xrange(offset, offset + n), 2)
+            g.add_edge(u, v)
+    for i in xrange(bridges):
+        g.add_edge(rng.randint(1, n), rng.randint(n+1, 2*n))
+    return g
+
+
+def timed(fn, *args, **kwargs):
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return (result, time.time() - start)
+
+
+def benchmark(name, g, num_trials):
+    (swCut, swTime) = timed(g.stoer_wagner_mincut)
+    (ksCut, ksTime) = timed(g.karger_stein_mincut, num_trials=num_trials,
+                            seed=1)
+    print "{:<28} stoer-wagner: {:>4} in {:7.2f}s   " \
+          "karger-stein ({} trials): {:>4} in {:7.2f}s".format(
+          name, swCut[0], swTime, num_trials, ksCut, ksTime)
+
+
+if __name__ == "__main__":
+    num_trials = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rng = random.Random(1)
+    g = Graph("graph.txt")
+    benchmark("graph.txt {}".format(g), g, num_trials)
+    for (n, degree) in ((100, 20), (250, 20), (500, 20)):
+        g = two_clusters_graph(n, degree, 5, rng)
+        benchmark(repr(g), g, num_trials)
@@ -2,10 +2,19 @@
 """
 Implements Karger's randomized contraction algorithm
 to compute the minimum-cut of a connected graph.
+Also implements the deterministic Stoer-Wagner algorithm, for an exact answer.
 """
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "..", "unionfind"))
+from unionfind import DenseUnionFind
 import random
-import copy
 import math
+import multiprocessing
+from array import array
+from itertools import izip, imap
+from heapq import heapify, heappop, heappush
 
 class Graph:
     def __init__(self, filename=None):
@@ -37,6 +46,19 @@ class Graph:
         # adjacency-list for an undirected graph
         self.num_edges //= 2 
     
+    def add_edge(self, u, v):
+        """
+        Adds an edge between vertices u and v (adding the vertices to the
+        graph, if not already present).
+        """
+        for (a, b) in ((u, v), (v, u)):
+            try:
+                self._edges[a].append(b)
+            except KeyError:
+                self._edges[a] = [b]
+                self.num_vertices += 1
+        self.num_edges += 1
+
     def contract_edge(self, u, v):
         """
         Contracts the edge(s) between vertices u and v.
@@ -67,85 +89,531 @@ class Graph:
         self.num_vertices = len(self._edges)
 
     
-    def pick_random_edge(self):
+    def pick_random_edge(self, rng=random):
         """
         Returns a randomly selected edge from the graph as a tuple.
+        rng => Source of randomness (random.Random instance or random module).
         """
-        n = random.randrange(2 * self.num_edges)
+        n = rng.randrange(2 * self.num_edges)
         for v,neighbors in self._edges.iteritems():
             if n < len(neighbors):
                 return (v,neighbors[n])
             else:
                 n -= len(neighbors)
 
-    def contract_random_edges(self, k=2):
+    def contract_random_edges(self, k=2, rng=random):
         """
         Performs randomized edge contractions until there are k vertices remaining.
         """
         while(self.num_vertices > k):
-            u,v = self.pick_random_edge()
+            u,v = self.pick_random_edge(rng)
             self.contract_edge(u,v)
 
-    def karger_mincut(self, num_trials=None):
+    def edge_arrays(self):
+        """
+        Returns the graph as a flat edge-list (n, us, vs): the vertices are
+        relabeled 0..n-1, and the i-th edge joins vertices us[i] and vs[i].
+        Each edge (including each copy of a parallel edge) appears once.
+        """
+        index = dict((v, i) for (i, v) in enumerate(self._edges))
+        us, vs = array("l"), array("l")
+        for v, neighbors in self._edges.iteritems():
+            i = index[v]
+            for w in neighbors:
+                j = index[w]
+                if i < j: # skips self-loops, and the 2nd copy of each edge
+                    us.append(i)
+                    vs.append(j)
+        return (len(index), us, vs)
+
+    def karger_mincut(self, num_trials=None, workers=None, seed=None,
+                      lower_bound=None, failure_probability=None,
+                      progress=None):
         """
         Runs Karger's randomized contraction algorithm to find the minimum-sized
         cut of the graph with a high probability.
-        Graph is not modified (contractions are performed on a copy of the graph).
-        num_trials => Number of times to run the algorithm before returning
-                      the best solution.
-                      If unspecified, defaults to binomial(N,2)*ln(N), where N is the 
-                      number of vertices. This makes P(failing to find the mincut) <= (1/N)
+        Graph is not modified (contractions are performed on a union-find
+        structure over the edge-list, see _karger_trial).
+        num_trials  => Number of times to run the algorithm before returning
+                       the best solution.
+                       If unspecified, defaults to binomial(N,2)*ln(N), where N is the 
+                       number of vertices. This makes P(failing to find the mincut) <= (1/N)
+        workers     => Number of processes to run the trials in (see _run_trials).
+        seed        => Seed for the trials. The same seed gives the same result,
+                       for any number of workers.
+        lower_bound => Stop as soon as a cut of this size is found.
+        failure_probability => Adaptive mode: run until the probability that
+                       the best cut found isn't the mincut is at most this
+                       value. Half of it is spent on the maximum number of
+                       trials (unless num_trials is specified), derived from
+                       the theoretical success probability of a trial; the
+                       other half on stopping earlier, after a chunk of
+                       trials whose estimated risk is low enough (see
+                       _failure_risk and _run_trials). The early stops from
+                       the empirical part of the estimate assume that a trial
+                       finds a mincut at least as often as any given larger
+                       cut; the ones from the theoretical part assume nothing.
+        progress    => Function called after each chunk of trials as
+                       progress(trials done, best cut so far, estimated risk).
         """
         N = self.num_vertices
-        num_trials = int( num_trials or math.ceil(math.log(N)*N*(N-1)/2) )
+        success_probability = 2.0/(N*(N-1)) if N > 1 else 1.0
+        num_trials = _num_trials(num_trials, _default_karger_trials(N),
+                                 success_probability, failure_probability)
         minCutSize = self.num_edges + 1 # upper bound on the mincut size
-        for i in xrange(num_trials):
-            graph = copy.deepcopy(self)
-            graph.contract_random_edges(2) # contract to 2 vertices
-            cutSize = len(graph.__edges.values()[0]) # cut size = degree of the super-vertex
-            if (cutSize < minCutSize):
-                minCutSize = cutSize
-        return minCutSize
+        return _run_trials(_karger_trials, self.edge_arrays(), num_trials,
+                           workers, seed, lower_bound, minCutSize,
+                           success_probability, failure_probability, progress)
     
-    def karger_stein(self):
+    def karger_stein(self, rng=random):
         """
         Performs a single trial of the Karger-Stein algorithm and returns the
-        size of the mincut.
-        Note: Modifies the graph.
+        size of the cut found.
+        rng => Source of randomness (random.Random instance or random module).
+        Graph is not modified (contractions are performed on compact
+        edge-lists, see _karger_stein_trial).
         """
-        N = self.num_vertices
-        if(N <= 6):
-            return self.karger_mincut()
-            
-        # v = int(math.ceil(N/math.sqrt(2) + 1)) # number of edges to contract to
-        v = int(math.ceil(N/math.sqrt(2))) # number of edges to contract to
-        self.contract_random_edges(v)
-        graphCopy = copy.deepcopy(self)
-        a = self.karger_stein()
-        b = graphCopy.karger_stein()
-        return min(a,b)
+        n, us, vs = self.edge_arrays()
+        data = _weighted_edges(range(n), n, us, vs)
+        return _karger_stein_trial(*(data + (rng,)))[0]
     
-    def karger_stein_mincut(self, num_trials=None):
+    def karger_stein_mincut(self, num_trials=None, workers=None, seed=None,
+                            lower_bound=None, failure_probability=None,
+                            progress=None):
         """
         Runs the improved (recursive) Karger-Stein contraction algorithm to find 
         the minimum-sized cut of the graph with a high probability.
-        Graph is not modified (contractions are performed on a copy of the graph).
-        num_trials => Number of times to run the algorithm before returning
-                      the best solution.
-                      If unspecified, defaults to log2(N)*ln(N), where N is the 
-                      number of vertices. This makes P(failing to find the mincut) <= (1/N)
+        Graph is not modified (contractions are performed on compact edge-lists,
+        see _karger_stein_trial).
+        num_trials  => Number of times to run the algorithm before returning
+                       the best solution.
+                       If unspecified, defaults to log2(N)*ln(N), where N is the 
+                       number of vertices. This makes P(failing to find the mincut) <= (1/N)
+        workers, seed, lower_bound, failure_probability, progress =>
+                       Same as for karger_mincut().
         """
         N = self.num_vertices
-        num_trials = int( num_trials or math.ceil(math.log(N,2)*math.log(N)) )
+        # Each level of the recursion keeps the mincut with probability
+        # >= 1/2, which gives a success probability >= 1/(depth + 1) for
+        # the depth <= 2*log2(N) of the recursion
+        success_probability = 1.0/(2*math.log(N,2) + 1) if N > 2 else 1.0
+        num_trials = _num_trials(num_trials,
+                                 math.ceil(math.log(N,2)*math.log(N)),
+                                 success_probability, failure_probability)
         minCutSize = self.num_edges + 1 # upper bound on the mincut size
-        for i in xrange(num_trials):
-            graph = copy.deepcopy(self)
-            cutSize = graph.karger_stein()
-            if(cutSize < minCutSize):
-                minCutSize = cutSize
-        return minCutSize
+        n, us, vs = self.edge_arrays()
+        data = _weighted_edges(range(n), n, us, vs)
+        return _run_trials(_karger_stein_trials, data, num_trials,
+                           workers, seed, lower_bound, minCutSize,
+                           success_probability, failure_probability, progress)
     
+    def stoer_wagner_mincut(self):
+        """
+        Runs the deterministic Stoer-Wagner algorithm to find the minimum cut
+        of the graph exactly, in O(N*M*log(N)) time.
+        Parallel edges are treated as a single edge weighted by their number.
+        Returns a tuple (cut-size, (vertices on one side, vertices on the
+        other side)), with the sides as sets of vertices.
+        Graph is not modified.
+        """
+        n, us, vs = self.edge_arrays()
+        labels = list(self._edges)
+        if n < 2:
+            return (0, (set(labels), set()))
+        # adjacency[v] => {neighbor => weight}; merged super-vertices are
+        # removed, and members[v] lists the vertices merged into v.
+        adjacency = [dict() for v in xrange(n)]
+        for (u, v) in izip(us, vs):
+            adjacency[u][v] = adjacency[u].get(v, 0) + 1
+            adjacency[v][u] = adjacency[v].get(u, 0) + 1
+        members = [[v] for v in xrange(n)]
+        active = range(n)
+
+        minCutSize, minCutSide = None, None
+        while len(active) > 1:
+            # Maximum-adjacency ordering: repeatedly add the vertex most
+            # tightly connected to the vertices added so far. Uses a max-heap
+            # (of negated connection weights) with lazy deletion.
+            connection = dict.fromkeys(active, 0)
+            heap = [(0, v) for v in active]
+            heapify(heap)
+            added = set()
+            prev, last = None, None
+            while heap:
+                negWeight, v = heappop(heap)
+                if v in added or -negWeight != connection[v]:
+                    continue
+                added.add(v)
+                prev, last = last, v
+                for (w, weight) in adjacency[v].iteritems():
+                    if w not in added:
+                        connection[w] += weight
+                        heappush(heap, (-connection[w], w))
+            # The cut-of-the-phase separates the last vertex from the rest
+            cutSize = connection[last]
+            if minCutSize is None or cutSize < minCutSize:
+                minCutSize, minCutSide = cutSize, list(members[last])
+            # Merge the last two vertices of the ordering
+            for (w, weight) in adjacency[last].iteritems():
+                del adjacency[w][last]
+                if w != prev:
+                    adjacency[prev][w] = adjacency[prev].get(w, 0) + weight
+                    adjacency[w][prev] = adjacency[prev][w]
+            members[prev].extend(members[last])
+            adjacency[last], members[last] = None, None
+            active.remove(last)
+
+        side = set(labels[v] for v in minCutSide)
+        return (minCutSize, (side, set(labels) - side))
+
     def __repr__(self):
 #        s = "\n".join("{}: {}".format(v,l) \
 #                      for (v,l) in self._edges.iteritems())
         return "Graph(|V|={}, |E|={})".format(self.num_vertices, self.num_edges)
+
+
+def _karger_trial(n, us, vs, order, rng):
+    """
+    Runs one trial of Karger's contraction algorithm on the flat edge-list
+    (n, us, vs) (see Graph.edge_arrays).
+    Contracting uniformly random edges is equivalent to merging the endpoints
+    of the edges in a uniformly random order (skipping edges within a merged
+    vertex, like Kruskal's algorithm), until two super-vertices remain.
+    The order is generated lazily by a Fisher-Yates shuffle of 'order' (a
+    list of the edge-indexes in any order, which is permuted in-place).
+    The cut consists of the edges crossing between the two super-vertices.
+    Returns a tuple (cut size, side), where side is the frozenset of the
+    vertices on the other side than vertex 0 (which identifies the cut).
+    """
+    uf = DenseUnionFind(n)
+    union = uf._union
+    randrange = rng.randrange
+    m = len(order)
+    t = 0
+    while uf.num_disjoint_sets > 2 and t < m:
+        j = randrange(t, m)
+        e = order[j]
+        order[j] = order[t]
+        order[t] = e
+        union(us[e], vs[e])
+        t += 1
+    find = uf._find
+    roots = [find(v) for v in xrange(n)]
+    cutSize = sum(1 for (u, v) in izip(us, vs) if roots[u] != roots[v])
+    return (cutSize, frozenset(v for v in xrange(n) if roots[v] != roots[0]))
+
+
+def _weighted_edges(labels, numLabels, us, vs, ws=None):
+    """
+    Relabels the endpoints of the edge-list (us, vs) using labels, and merges
+    parallel edges into weighted edges (with weights ws, or 1 if unspecified).
+    Self-loops are dropped.
+    Returns the weighted edge-list (numLabels, us, vs, ws).
+    """
+    weights = {} # a*numLabels + b => weight, where a < b
+    for i in xrange(len(us)):
+        a, b = labels[us[i]], labels[vs[i]]
+        if a == b:
+            continue
+        if a > b:
+            a, b = b, a
+        key = a*numLabels + b
+        weights[key] = weights.get(key, 0) + (ws[i] if ws else 1)
+    newUs, newVs, newWs = array("l"), array("l"), array("l")
+    for (key, w) in weights.iteritems():
+        newUs.append(key // numLabels)
+        newVs.append(key % numLabels)
+        newWs.append(w)
+    return (numLabels, newUs, newVs, newWs)
+
+
+def _contract_to(n, us, vs, ws, k, rng):
+    """
+    Contracts uniformly random edges of the weighted edge-list (n, us, vs, ws)
+    (where an edge of weight w stands for w parallel edges) until k
+    super-vertices remain.
+    Like in _karger_trial, the endpoints of the edges are merged in random
+    order: giving each of the parallel edges an exponentially distributed
+    arrival-time, the first of w parallel edges arrives after an
+    Exponential(w) time, and the later ones are self-loops.
+    Returns a tuple (labels, contracted multigraph as a new weighted
+    edge-list), where labels[v] is the super-vertex (relabeled 0..k-1, in
+    order of their smallest vertex) which vertex v was merged into. If the
+    graph is disconnected, the edges may run out first: more than k
+    super-vertices then remain.
+    """
+    uf = DenseUnionFind(n)
+    union = uf._union
+    expovariate = rng.expovariate
+    arrivals = [(expovariate(ws[i]), i) for i in xrange(len(ws))]
+    heapify(arrivals)
+    while uf.num_disjoint_sets > k and arrivals:
+        i = heappop(arrivals)[1]
+        union(us[i], vs[i])
+    # Relabel the super-vertices
+    find = uf._find
+    labels = array("l", [-1]) * n
+    numLabels = 0
+    for v in xrange(n):
+        r = find(v)
+        if labels[r] < 0:
+            labels[r] = numLabels
+            numLabels += 1
+        labels[v] = labels[r]
+    return (labels, _weighted_edges(labels, numLabels, us, vs, ws))
+
+
+def _exact_small_mincut(n, us, vs, ws):
+    """
+    Returns a tuple (weight of the minimum cut, side) of a small weighted
+    edge-list (n, us, vs, ws), by trying every bipartition of the vertices.
+    side is the frozenset of the vertices on the other side than vertex 0.
+    """
+    if n < 2:
+        return (0, frozenset())
+    edges = zip(us, vs, ws)
+    # Vertex 0 stays on side 0; bit i of mask puts vertex i on side 1
+    (cutSize, mask) = min((sum(w for (u, v, w) in edges \
+                               if (mask >> u ^ mask >> v) & 1), mask) \
+                          for mask in xrange(2, 1 << n, 2))
+    return (cutSize, frozenset(v for v in xrange(n) if (mask >> v) & 1))
+
+
+def _karger_stein_trial(n, us, vs, ws, rng):
+    """
+    Runs one trial of the Karger-Stein algorithm on the weighted edge-list
+    (n, us, vs, ws) and returns a tuple (size of the cut found, side), like
+    _karger_trial.
+    The graph is contracted (twice, independently) to about n/sqrt(2)
+    super-vertices, and each contracted graph is recursed on. Graphs with at
+    most 6 vertices are solved exactly, and disconnected graphs have a cut of
+    size 0.
+    Every level only holds its own compact edge-list (with at most one
+    weighted edge per pair of super-vertices), so no graphs are copied and
+    the memory stays bounded along the recursion.
+    """
+    if n <= 6:
+        return _exact_small_mincut(n, us, vs, ws)
+    k = int(math.ceil(1 + n/math.sqrt(2)))
+    best = None
+    for branch in xrange(2):
+        (labels, contracted) = _contract_to(n, us, vs, ws, k, rng)
+        if contracted[0] > k:
+            # The edges ran out: the graph is disconnected, and the
+            # component of vertex 0 is a cut of size 0
+            return (0, frozenset(v for v in xrange(n) if labels[v] != 0))
+        (cutSize, side) = _karger_stein_trial(*(contracted + (rng,)))
+        if best is None or cutSize < best[0]:
+            best = (cutSize, labels, side)
+    # Map the side back to the vertices of this level. Vertex 0 is always
+    # merged into super-vertex 0, so stays out of the side.
+    (cutSize, labels, side) = best
+    return (cutSize, frozenset(v for v in xrange(n) if labels[v] in side))
+
+
+def _default_karger_trials(N):
+    return int(math.ceil(math.log(N)*N*(N-1)/2)) if N > 1 else 1
+
+
+def _num_trials(num_trials, default, success_probability, failure_probability):
+    """
+    Returns the (maximum) number of trials to run: num_trials if specified.
+    Otherwise, in adaptive mode, the number of trials which is guaranteed to
+    find the mincut with probability >= 1 - failure_probability/2, given the
+    (lower bound on the) success_probability of a single trial; else default.
+    """
+    if num_trials:
+        return int(num_trials)
+    if failure_probability is None:
+        return int(default)
+    if success_probability >= 1:
+        return 1
+    return max(1, int(math.ceil(math.log(failure_probability / 2.0) /
+                                math.log1p(-success_probability))))
+
+
+def _success_lower_bound(hits, trials, delta):
+    """
+    Returns a lower confidence bound, at level 1 - delta, on the success
+    probability q of independent trials of which hits succeeded: the
+    smallest q such that trials * KL(hits/trials || q) <= ln(1/delta), found
+    by bisection. By the Chernoff-Hoeffding bound,
+    P(Binomial(trials, q) >= hits) <= exp(-trials * KL(hits/trials || q))
+    for any q below hits/trials, so the bound exceeds q with probability at
+    most delta.
+    """
+    if hits <= 0:
+        return 0.0
+    rate = float(hits) / trials
+    target = math.log(1 / delta)
+    def divergence(q): # trials * KL(rate || q)
+        d = rate * math.log(rate / q)
+        if rate < 1:
+            d += (1 - rate) * math.log((1 - rate) / (1 - q))
+        return trials * d
+    (lo, hi) = (0.0, rate)
+    for i in xrange(60):
+        mid = (lo + hi) / 2
+        if mid <= 0 or divergence(mid) > target:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def _failure_risk(trials, hits, success_probability, delta=None):
+    """
+    Bounds the probability that none of trials independent trials found a
+    (given) mincut, where hits is the number of trials which found the most
+    frequent of the best cuts found.
+    The theoretical bound is (1 - success_probability)^trials.
+    If delta is specified, also uses an empirical bound which is much tighter
+    on most graphs: assuming that a trial finds a mincut at least as often as
+    any given larger cut, a lower confidence bound pLower on the frequency of
+    any cut found bounds the success probability from below, and the bound
+    is then (1 - pLower)^trials. (Distinct cuts are counted separately: a
+    graph may have many cuts of the same larger size, e.g. around each of its
+    vertices of minimum degree, which together are found more often than the
+    mincut.)
+    pLower (see _success_lower_bound) only counts the hits after the first
+    one, which are unbiased whichever trial first found the cut, and holds
+    at level 1 - delta/trials: a union bound over the at most trials distinct
+    cuts found, since the most frequent one is picked after the fact. So it
+    fails for any of them with probability at most delta.
+    """
+    pLower = success_probability
+    if delta is not None and hits > 1:
+        pLower = max(pLower, _success_lower_bound(hits - 1, trials,
+                                                  delta / trials))
+    if pLower >= 1:
+        return 0.0
+    return math.exp(trials * math.log1p(-pLower))
+
+
+# Number of trials handed to a worker at once by _run_trials
+_TRIALS_PER_TASK = 16
+
+# The graph-data that trials are run on, as seen by the worker processes
+_trial_data = None
+
+def _init_trials(data):
+    global _trial_data
+    _trial_data = data
+
+
+def _trial_rng(seed, trial):
+    """
+    Returns the random-number generator for the specified trial.
+    Every trial gets its own stream, derived from the seed and the trial-index
+    only, so results don't depend on which process runs which trial.
+    """
+    return random.Random((seed << 40) | trial)
+
+
+def _karger_trials(task):
+    """
+    Runs the trials [start, stop) of Karger's algorithm on _trial_data (an
+    edge-list, see Graph.edge_arrays). Returns the result of _best_cut.
+    The edge-order list is allocated once for the chunk, and reset to the
+    identity order before each trial, so every trial shuffles the same input.
+    """
+    seed, start, stop = task
+    n, us, vs = _trial_data
+    base = range(len(us))
+    order = base[:]
+    def trial(i):
+        order[:] = base
+        return _karger_trial(n, us, vs, order, _trial_rng(seed, i))
+    return _best_cut(trial(i) for i in xrange(start, stop))
+
+
+def _karger_stein_trials(task):
+    """
+    Runs the trials [start, stop) of the Karger-Stein algorithm on
+    _trial_data (a weighted edge-list, see _weighted_edges).
+    Returns the result of _best_cut.
+    """
+    seed, start, stop = task
+    n, us, vs, ws = _trial_data
+    return _best_cut(_karger_stein_trial(n, us, vs, ws, _trial_rng(seed, i))
+                     for i in xrange(start, stop))
+
+
+def _best_cut(cuts):
+    """
+    Returns a tuple (smallest cut size, {side => number of occurrences}) of
+    the (cut size, side) tuples returned by a sequence of trials, counting
+    the occurrences of each of the distinct smallest cuts.
+    """
+    minCutSize, hits = None, {}
+    for (cutSize, side) in cuts:
+        if minCutSize is None or cutSize < minCutSize:
+            minCutSize, hits = cutSize, {}
+        if cutSize == minCutSize:
+            hits[side] = hits.get(side, 0) + 1
+    return (minCutSize, hits)
+
+
+def _run_trials(trials_fn, data, num_trials, workers, seed, lower_bound,
+                minCutSize, success_probability=0.0, failure_probability=None,
+                progress=None):
+    """
+    Runs num_trials randomized trials by calling trials_fn on chunks of trial
+    indexes, and returns the smallest cut found (or minCutSize if smaller).
+    If workers > 1, the chunks are distributed to a pool of processes which
+    receive the graph-data once, at start-up. The results are reduced in order
+    as they arrive, stopping early if a cut of size lower_bound is found, or
+    in adaptive mode (failure_probability specified) if the risk of having
+    missed the mincut (see _failure_risk) is low enough.
+    The adaptive mode spends failure_probability/2 over the repeated checks
+    (the other half bounds the risk after num_trials, see _num_trials): the
+    j-th check spends failure_probability/(4*j*(j+1)) on the confidence of
+    the empirical bound, and stops if the risk is at most as much again.
+    These sum to failure_probability/2 over all the checks, so by a union
+    bound the best cut is the mincut with probability at least
+    1 - failure_probability, however many checks are made.
+    progress => If specified, called after each chunk as
+                progress(trials done, best cut so far, estimated risk).
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    tasks = ((seed, start, min(start + _TRIALS_PER_TASK, num_trials)) \
+             for start in xrange(0, num_trials, _TRIALS_PER_TASK))
+    pool = None
+    if workers is None or workers <= 1:
+        _init_trials(data)
+        results = imap(trials_fn, tasks)
+    else:
+        pool = multiprocessing.Pool(workers, _init_trials, (data,))
+        results = pool.imap(trials_fn, tasks)
+    trials = 0
+    checks = 0
+    hits = {} # side => number of trials which found that cut of minCutSize
+    try:
+        for (cutSize, cutHits) in results:
+            trials += min(_TRIALS_PER_TASK, num_trials - trials)
+            if (cutSize < minCutSize):
+                minCutSize, hits = cutSize, cutHits
+            elif (cutSize == minCutSize):
+                for (side, count) in cutHits.iteritems():
+                    hits[side] = hits.get(side, 0) + count
+            if lower_bound is not None and minCutSize <= lower_bound:
+                break
+            if progress is not None or failure_probability is not None:
+                spend = None
+                if failure_probability is not None:
+                    checks += 1
+                    spend = failure_probability / (4.0*checks*(checks + 1))
+                risk = _failure_risk(trials, max(hits.values() or [0]),
+                                     success_probability, spend)
+                if progress is not None:
+                    progress(trials, minCutSize, risk)
+                if spend is not None and risk <= spend:
+                    break
+    finally:
+        if pool is None:
+            _init_trials(None)
+        else:
+            pool.terminate()
+            pool.join()
+    return minCutSize
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the SCC algorithms, on an edge-list file in the format of the
+SCC assignment (one "tail head" edge per line).
+Usage: python benchmark.py incremental|parallel|load [filename]
+                           [max number of edges (0 = all)] [number of workers]
+    - incremental: replays the edges in random order into an IncrementalSCC,
+      and compares the amortized cost of an insertion with recomputing the
+      SCCs from scratch.
+    - parallel: compares forward_backward_SCCs() on 1 and on all the CPUs
+      (and Tarjan's algorithm).
+    - load: reads the whole file into a Graph and into a CSRGraph, and reports
+      the parsing throughput.
+"""
+import sys
+import time
+import random
+import multiprocessing
+from scc import Graph, CSRGraph, IncrementalSCC
+
+def read_edges(filename, max_edges=None):
+    edges = []
+    with open(filename, "r") as FILE:
+        for line in FILE:
+            l = line.split()
+            if len(l) == 0:
+                continue
+            u = int(l[0])
+            edges.extend((u, int(v)) for v in l[1:])
+            if max_edges is not None and len(edges) >= max_edges:
+                return edges[:max_edges]
+    return edges
+
+
+def component_sizes(SCCs):
+    return sorted(len(scc) for scc in SCCs)
+
+
+def benchmark_incremental(edges, seed=1):
+    edges = list(edges)
+    random.Random(seed).shuffle(edges)
+    inc = IncrementalSCC()
+    merges = 0
+    start = time.time()
+    for (u, v) in edges:
+        if inc.add_edge(u, v):
+            merges += 1
+    incTime = time.time() - start
+    print "incremental: {} in {:.2f}s ({:.1f} us/insertion, {} merging)".format(
+          inc, incTime, 1e6 * incTime / len(edges), merges)
+
+    graph = CSRGraph()
+    graph.add_graph_data(edges)
+    start = time.time()
+    SCCs = graph.tarjan_SCCs_pearce()
+    fullTime = time.time() - start
+    print "full recompute: {} in {:.2f}s, i.e. {:.0f}x an insertion".format(
+          graph, fullTime, fullTime * len(edges) / incTime)
+    assert component_sizes(SCCs) == component_sizes(inc.SCCs())
+
+
+def benchmark_parallel(edges, workers=None):
+    workers = workers or multiprocessing.cpu_count()
+    graph = CSRGraph()
+    graph.add_graph_data(edges)
+    graph.reverse_graph() # build (and cache) the reversed graph up-front
+    graph.reverse_graph()
+    start = time.time()
+    SCCs = graph.tarjan_SCCs_pearce()
+    print "tarjan_SCCs_pearce: {} in {:.2f}s".format(graph, time.time() - start)
+
+    times = {}
+    for w in sorted(set([1, workers])):
+        start = time.time()
+        fbSCCs = graph.forward_backward_SCCs(workers=w)
+        times[w] = time.time() - start
+        print "forward_backward_SCCs({} workers): {:.2f}s, speedup {:.2f}x".format(
+              w, times[w], times[1] / times[w])
+        assert component_sizes(fbSCCs) == component_sizes(SCCs)
+
+
+def benchmark_load(filename):
+    for cls in (Graph, CSRGraph):
+        start = time.time()
+        graph = cls(filename)
+        stats = graph.read_stats
+        print "{}: {:.2f}s (parse {:.2f}s at {:.1f} MB/s, build {:.2f}s)".format(
+              graph, time.time() - start, stats.parse_time, stats.parse_MBps,
+              stats.build_time)
+        del graph
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "parallel"
+    filename = sys.argv[2] if len(sys.argv) > 2 else "SCC.txt"
+    if mode == "load":
+        benchmark_load(filename)
+        sys.exit()
+    max_edges = int(sys.argv[3]) or None if len(sys.argv) > 3 else None
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    edges = read_edges(filename, max_edges)
+    print "{}: {} edges".format(filename, len(edges))
+    if mode == "incremental":
+        benchmark_incremental(edges)
+    else:
+        benchmark_parallel(edges, workers)
@@ -6,7 +6,44 @@ Procedures to:
     - Sort the vertices in a topological order
     - Find the strongly-connected-components (using either Kosaraju's algorithm
       or using Tarjan's algorithm).
+    - Find the strongly-connected-components with a pool of processes, using
+      the forward-backward algorithm.
+    - Maintain the strongly-connected-components of a graph as edges are
+      inserted (IncrementalSCC).
+The graph is stored either as a dict of adjacency-lists (Graph), or in compact
+compressed-sparse-row arrays (CSRGraph) for large graphs.
 """
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "..", "unionfind"))
+from unionfind import UnionFind
+from itertools import imap, izip
+from heapq import nlargest
+from collections import namedtuple
+import gc
+import time
+import ctypes
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Kinds of the events generated by Graph.dfs_events()
+PREORDER, POSTORDER = 0, 1
+
+# Statistics of the last Graph.read_from(): the parse-time covers reading and
+# tokenizing the file, the build-time the construction of the adjacency-lists
+ReadStats = namedtuple("ReadStats", ("num_bytes", "num_edges", "parse_time",
+                                     "build_time", "parse_MBps"))
+
+# Result of Graph.scc_summary()
+SCCSummary = namedtuple("SCCSummary", ("components", "num_SCCs", "largest",
+                                       "dag_offsets", "dag_targets"))
+
 class Graph:
     def __init__(self, filename=None):
         """
@@ -17,6 +54,7 @@ class Graph:
         self.num_vertices = 0
         self.num_edges = 0
         self.vertices = set() # set of all vertices
+        self.read_stats = None # ReadStats of the last read_from()
         if(filename):
             self.read_from(filename)
     
@@ -24,15 +62,34 @@ class Graph:
         """
         Reads graph from the specified file.
         File format: Each line specifies a vertex followed by its "out-neighbors".
+        The file is parsed in large blocks straight into arrays of edges (see
+        _read_edge_list), without building a list per line; the throughput
+        is recorded in self.read_stats.
         """
-        data = []
-        with open(filename, "r") as FILE:
-            for line in FILE:
-                l = line.split()
-                if len(l) == 0:
-                    continue
-                data.append(map(int, l))
-        self.add_graph_data(data)
+        start = time.time()
+        sources, us, vs, numBytes = _read_edge_list(filename)
+        parseTime = time.time() - start
+        self._add_edges(sources, us, vs)
+        buildTime = time.time() - start - parseTime
+        self.read_stats = ReadStats(numBytes, len(us), parseTime, buildTime,
+                                    numBytes / 1e6 / max(parseTime, 1e-6))
+
+    def _add_edges(self, sources, us, vs):
+        """
+        Adds the vertices in sources, and the edges us[i] -> vs[i] (arrays of
+        vertex labels). Out-neighbors keep the order in which they were added.
+        """
+        outEdges = self._out_edges
+        vertices = self.vertices
+        vertices.update(sources)
+        vertices.update(vs)
+        for v in vertices:
+            if v not in outEdges:
+                outEdges[v] = []
+        for u, v in izip(us, vs):
+            outEdges[u].append(v)
+        self.num_edges += len(us)
+        self.num_vertices = len(vertices)
         
     def add_graph_data(self, data):
         for line in data:
@@ -102,7 +159,9 @@ class Graph:
         """
         Performs a DFS without using recursion. Useful for "deep" graphs.
         Parameters and return value are similar to dfs_recursive().
+        Adjacency-lists are scanned in place, as in dfs_events().
         """
+        outEdges = self._out_edges
         sources = self.vertices if source is None else [source]
         if doneVertices is None: doneVertices = set()
         visited = set()
@@ -111,25 +170,62 @@ class Graph:
             visited.add(src)
             doneVertices.add(src)
             if preorderCallback: preorderCallback(src)
-            stack = [src, None] + self._out_edges[src]
-            while stack:
-                v = stack.pop()
-                if v is not None:
-                    # We just popped off a 'child' vertex v for which the
-                    # parent is still on the stack.
-                    if v in doneVertices: continue
-                    if preorderCallback: preorderCallback(v)
-                    doneVertices.add(v)
-                    visited.add(v)
-                    stack.extend([v, None] + self._out_edges[v])
+            path = [src]
+            cursors = [iter(outEdges[src])]
+            while cursors:
+                for v in cursors[-1]:
+                    if v not in doneVertices:
+                        break
                 else:
-                    # We just popped off the 'None' flag to indicate that
-                    # we are done with all children of some parent vertex,
-                    # which now must be at the top of the stack.
-                    v = stack.pop()
+                    # We are done with all children of the vertex on top
+                    cursors.pop()
+                    v = path.pop()
                     if postorderCallback: postorderCallback(v)
+                    continue
+                if preorderCallback: preorderCallback(v)
+                doneVertices.add(v)
+                visited.add(v)
+                path.append(v)
+                cursors.append(iter(outEdges[v]))
         return visited
 
+    def dfs_events(self, source=None, doneVertices=None):
+        """
+        Lazy iterative DFS: generates the events (PREORDER, v) when the vertex
+        v is first visited, and (POSTORDER, v) once all its descendants are
+        done. Starts from "source", or (if unspecified) from every unvisited
+        vertex in turn. Vertices are added to doneVertices as they are
+        visited, so the search can be stopped at any event and doneVertices
+        still holds exactly the visited vertices.
+        Each adjacency-list is scanned in place with a cursor (a list-iterator),
+        instead of being copied onto the stack.
+        """
+        outEdges = self._out_edges
+        sources = self.vertices if source is None else [source]
+        if doneVertices is None: doneVertices = set()
+        markDone = doneVertices.add
+        for src in sources:
+            if src in doneVertices: continue
+            markDone(src)
+            yield (PREORDER, src)
+            # path[i] is the vertex at depth i, and cursors[i] an iterator
+            # over its out-edges, positioned at the next edge to follow
+            path = [src]
+            cursors = [iter(outEdges[src])]
+            while cursors:
+                for w in cursors[-1]:
+                    if w not in doneVertices:
+                        break
+                else:
+                    # All the children of the vertex on top are done
+                    cursors.pop()
+                    yield (POSTORDER, path.pop())
+                    continue
+                markDone(w)
+                yield (PREORDER, w)
+                path.append(w)
+                cursors.append(iter(outEdges[w]))
+
     def tarjan_SCCs_recursive(self):
         """
         Recursive implementation of Tarjan's single-pass algorithm to find the 
@@ -201,6 +297,163 @@ class Graph:
 
         return SCCs
 
+    def tarjan_SCCs_pearce(self, component_ids=False):
+        """
+        Iterative implementation of Tarjan's algorithm, with Pearce's
+        space-efficient variant (see _pearce_SCCs): a single visit-index per
+        vertex, and per-vertex edge-cursors instead of per-edge stack entries.
+        Much faster than tarjan_SCCs_iterative().
+        Returns the SCCs as a list of sets (in the same order as
+        tarjan_SCCs_recursive), or, if component_ids is True, as an array of
+        SCC indexes (into that list), in the order of the vertices in
+        self.vertices.
+        """
+        components, numSCCs = self._pearce_components()
+        if component_ids:
+            return components
+        SCCs = [set() for c in xrange(numSCCs)]
+        for v, c in zip(self.vertices, components):
+            SCCs[c].add(v)
+        return SCCs
+
+    def _pearce_components(self):
+        """
+        Runs _pearce_SCCs on the graph.
+        Returns a tuple (array of the SCC index of each vertex, in the order
+        of self.vertices, number of SCCs).
+        """
+        rindex = dict.fromkeys(self.vertices, 0)
+        numSCCs = _run_without_gc(_pearce_SCCs, self.vertices, rindex,
+                                  self._out_edges)
+        top = len(rindex) - 1
+        return (array("l", (top - rindex[v] for v in self.vertices)), numSCCs)
+
+    def forward_backward_SCCs(self, workers=None):
+        """
+        Finds the SCCs of the graph with a pool of processes, using the
+        forward-backward algorithm:
+        First, vertices with no incoming or no outgoing edges (left) are
+        trimmed off as singleton SCCs. Then, for a subproblem (a set of
+        vertices which no SCC crosses), the SCC of a pivot vertex is the
+        intersection of the vertices it reaches (forward) and of those which
+        reach it (backward); the rest splits into 3 independent subproblems:
+        forward-only, backward-only and unreached vertices. The subproblems
+        are processed in parallel by the workers, which share the CSR arrays
+        (and an array of subproblem "colors" of the vertices) in shared
+        memory. Small subproblems are solved directly with Tarjan's
+        algorithm (see _fb_task).
+        workers => Number of processes. Defaults to the number of CPUs.
+        Returns the SCCs as a list of sets (in no particular order).
+        """
+        workers = workers or multiprocessing.cpu_count()
+        labels, offsets, targets, inOffsets, inTargets = \
+            self._csr_arrays(reverse=True)
+        n = len(labels)
+        shared = tuple(_shared_copy(a) for a in \
+                       (offsets, targets, inOffsets, inTargets)) + \
+                 (RawArray("l", n),) # colors: all 0 (subproblem 0)
+        SCCs, remaining = _trim(n, offsets, targets, inOffsets, inTargets,
+                                shared[-1])
+        del offsets, targets, inOffsets, inTargets
+        small = max(_FB_MIN_SUBPROBLEM, len(remaining) // (4 * workers))
+        # Task: (vertices of a subproblem, its color, fresh colors, small)
+        tasks = [(remaining, 0, 1, 2, small)] if remaining else []
+        nextColor = 3
+        pool = None
+        if workers <= 1:
+            _init_fb_worker(shared)
+            runTasks = lambda tasks: imap(_fb_task, tasks)
+        else:
+            pool = multiprocessing.Pool(workers, _init_fb_worker, (shared,))
+            runTasks = lambda tasks: pool.imap_unordered(_fb_task, tasks)
+        try:
+            while tasks:
+                nextTasks = []
+                for (taskSCCs, subproblems) in runTasks(tasks):
+                    SCCs.extend(taskSCCs)
+                    for (vertices, color) in subproblems:
+                        nextTasks.append((vertices, color, nextColor,
+                                          nextColor + 1, small))
+                        nextColor += 2
+                tasks = nextTasks
+        finally:
+            if pool is None:
+                _init_fb_worker(None)
+            else:
+                pool.terminate()
+                pool.join()
+        return [set(labels[v] for v in scc) for scc in SCCs]
+
+    def scc_summary(self, k=10):
+        """
+        Computes the SCCs of the graph (see tarjan_SCCs_pearce) without
+        building a set per SCC, and summarizes them.
+        Returns an SCCSummary tuple with:
+            components => Array of the SCC index of each vertex, in the order
+                          of self.vertices. SCCs are indexed in reverse
+                          topological-order (an SCC only has edges to SCCs
+                          with smaller indexes).
+            num_SCCs   => The number of SCCs.
+            largest    => List of (size, SCC index) of the k largest SCCs,
+                          largest first (kept in a bounded heap).
+            dag_offsets, dag_targets => The condensation of the graph (the
+                          DAG of the SCCs, without parallel edges) as CSR
+                          arrays: the SCCs which SCC c has edges to are
+                          dag_targets[dag_offsets[c]:dag_offsets[c+1]].
+        """
+        components, numSCCs = self._pearce_components()
+        sizes = array("l", [0]) * numSCCs
+        for c in components:
+            sizes[c] += 1
+        largest = nlargest(k, izip(sizes, xrange(numSCCs)))
+
+        # Group the vertices by SCC (counting-sort), so that the condensation
+        # is built in a single pass over the edges, SCC by SCC
+        starts = array("l", [0]) * (numSCCs + 1)
+        for c in xrange(numSCCs):
+            starts[c+1] = starts[c] + sizes[c]
+        del sizes
+        members = array("l", [0]) * len(components)
+        for (i, c) in enumerate(components):
+            members[starts[c]] = i
+            starts[c] += 1
+        labels, offsets, targets = self._csr_arrays()
+        # stamp[d] == c when the edge c -> d was already added
+        stamp = array("l", [-1]) * numSCCs
+        dagOffsets, dagTargets = array("l", [0]), array("l")
+        start = 0
+        for c in xrange(numSCCs):
+            stamp[c] = c # skip the edges within the SCC
+            for i in members[start:starts[c]]:
+                for t in targets[offsets[i]:offsets[i+1]]:
+                    d = components[t]
+                    if stamp[d] != c:
+                        stamp[d] = c
+                        dagTargets.append(d)
+            dagOffsets.append(len(dagTargets))
+            start = starts[c]
+        return SCCSummary(components, numSCCs, largest, dagOffsets, dagTargets)
+
+    def _csr_arrays(self, reverse=False):
+        """
+        Returns the graph as a tuple of CSR arrays (labels, offsets, targets):
+        the vertices (in the order of self.vertices) are numbered 0..n-1,
+        labels[i] is the i-th vertex and its out-neighbors are
+        targets[offsets[i]:offsets[i+1]].
+        If reverse is True, the tuple also has the CSR arrays of the reversed
+        graph (inOffsets, inTargets).
+        """
+        labels = list(self.vertices)
+        ids = dict((v, i) for (i, v) in enumerate(labels))
+        offsets, targets = array("l", [0]), array("i")
+        for v in labels:
+            targets.extend(map(ids.__getitem__, self._out_edges[v]))
+            offsets.append(len(targets))
+        if not reverse:
+            return (labels, offsets, targets)
+        return (labels, offsets, targets) + \
+               _transpose_csr(len(labels), offsets, targets)
+
     @staticmethod
     def _tarjan_extract_scc(root, sccStack, dfsInfo):
         """
@@ -221,9 +474,8 @@ class Graph:
         """
         Returns the list of vertices of the graph, sorted in a topological-order.
         """
-        topoList = []
-        cb = lambda v: topoList.append(v)
-        self.dfs_iterative(postorderCallback=cb)
+        topoList = _run_without_gc(list, (v for kind, v in self.dfs_events() \
+                                          if kind == POSTORDER))
         topoList.reverse()
         return topoList
     
@@ -234,21 +486,740 @@ class Graph:
         Returns the SCCs as a list of sets.
         The list of SCCs is in topological-order wrt the "metagraph" of SCC-nodes.
         """
-        done = set() # set of vertices already classified into SCCs
-        SCCs = []
+        def second_pass(vertex_order):
+            done = set() # set of vertices already classified into SCCs
+            SCCs = []
+            for v in vertex_order:
+                if v in done:
+                    continue
+                scc = self.dfs_iterative(v, doneVertices=done)
+                SCCs.append(scc)
+            return SCCs
+
         vertex_order = self.topological_order()
-        self.reverse_graph()        
-        for v in vertex_order:
-            if v in done:
-                continue
-            scc = self.dfs_iterative(v, doneVertices=done)
-            SCCs.append(scc)
+        self.reverse_graph()
+        SCCs = _run_without_gc(second_pass, vertex_order)
         self.reverse_graph()
         return SCCs
 
     def __repr__(self):
         return "Graph(|V|={}, |E|={})".format(self.num_vertices, self.num_edges)
 
+
+class CSRGraph(Graph):
+    """
+    A directed graph stored in compressed-sparse-row (CSR) arrays: the
+    out-neighbors of the vertex with index i are
+    _targets[_offsets[i]:_offsets[i+1]].
+    Vertices are mapped to the indexes 0..n-1, by an offset if their labels
+    are contiguous integers (e.g. 1..n), or by a dict otherwise. Each edge
+    takes 4 bytes, plus 4 more for the reversed graph (built on the first call
+    to reverse_graph).
+    All the methods of Graph work unchanged: the adjacency-list of a vertex is
+    materialized when it is accessed. self.vertices is a sequence of the
+    vertex labels, in increasing order.
+    """
+    def __init__(self, filename=None):
+        """
+        Initialize a graph by reading from the specified file, or a blank graph
+        if unspecified.
+        """
+        self._labels = None # index => vertex label (None if contiguous)
+        self._ids = None    # vertex label => index (None if contiguous)
+        self._first = 0     # label of the vertex with index 0, if contiguous
+        self.num_vertices = 0
+        self.read_stats = None # ReadStats of the last read_from()
+        self._set_csr(array("l", [0]), array("i"))
+        if(filename):
+            self.read_from(filename)
+
+    def add_graph_data(self, data):
+        sources, us, vs = array("l"), array("l"), array("l")
+        for line in data:
+            vertex = line[0]
+            sources.append(vertex)
+            us.extend(array("l", [vertex]) * (len(line) - 1))
+            vs.extend(line[1:])
+        self._add_edges(sources, us, vs)
+
+    def _vertex_index(self, v):
+        """
+        Returns the index of the vertex labeled v (KeyError if not present).
+        """
+        if self._ids is not None:
+            return self._ids[v]
+        i = v - self._first
+        if not 0 <= i < self.num_vertices:
+            raise KeyError(v)
+        return i
+
+    def _edge_labels(self):
+        """
+        Returns the edges of the graph as two arrays (sources, targets) of
+        vertex labels.
+        """
+        us, vs = array("l"), array("l")
+        labels = self.vertices
+        offsets, targets = self._offsets, self._targets
+        for i in xrange(self.num_vertices):
+            lo, hi = offsets[i], offsets[i+1]
+            us.extend(array("l", [labels[i]]) * (hi - lo))
+            vs.extend(labels[t] for t in targets[lo:hi])
+        return (us, vs)
+
+    def _add_edges(self, sources, us, vs):
+        """
+        Adds the vertices in sources, and the edges us[i] -> vs[i] (arrays of
+        vertex labels), and rebuilds the CSR arrays. Out-neighbors keep the
+        order in which they were added.
+        """
+        if self.num_vertices:
+            oldUs, oldVs = self._edge_labels()
+            sources = array("l", self.vertices) + sources
+            us, vs = oldUs + us, oldVs + vs
+        # Map the vertex labels to indexes
+        if np is not None and len(vs):
+            self._map_labels_numpy(sources, us, vs)
+            return
+        labels = sorted(set(sources).union(vs))
+        n = len(labels)
+        if n == 0 or labels[-1] - labels[0] == n - 1:
+            self._labels, self._ids = None, None
+            self._first = labels[0] if n else 0
+            first = self._first
+            us = array("i", (v - first for v in us))
+            vs = array("i", (v - first for v in vs))
+        else:
+            self._labels = array("l", labels)
+            ids = self._ids = dict((v, i) for (i, v) in enumerate(labels))
+            us = array("i", (ids[v] for v in us))
+            vs = array("i", (ids[v] for v in vs))
+        self.num_vertices = n
+        self._set_csr(*_csr_from_edges(n, us, vs))
+
+    def _map_labels_numpy(self, sources, us, vs):
+        """
+        Same as the end of _add_edges(), with numpy: the labels are sorted and
+        deduplicated by np.union1d, and mapped to indexes by a subtraction or
+        a binary-search.
+        """
+        us = np.frombuffer(us, dtype=np.dtype("l"))
+        vs = np.frombuffer(vs, dtype=np.dtype("l"))
+        labels = np.union1d(np.frombuffer(sources, dtype=np.dtype("l")), vs)
+        n = len(labels)
+        if labels[-1] - labels[0] == n - 1:
+            self._labels, self._ids = None, None
+            self._first = first = int(labels[0])
+            us = (us - first).astype(np.int32)
+            vs = (vs - first).astype(np.int32)
+        else:
+            self._labels = array("l", labels.tostring())
+            self._ids = dict(izip(self._labels, xrange(n)))
+            us = np.searchsorted(labels, us).astype(np.int32)
+            vs = np.searchsorted(labels, vs).astype(np.int32)
+        self.num_vertices = n
+        self._set_csr(*_csr_from_edges(n, array("i", us.tostring()),
+                                       array("i", vs.tostring())))
+
+    def _set_csr(self, offsets, targets):
+        self._offsets, self._targets = offsets, targets
+        self._out_edges = _CSRAdjacency(self, offsets, targets)
+        self._in_edges = None # built by reverse_graph()
+        self.num_edges = len(targets)
+
+    def _pearce_components(self):
+        n = self.num_vertices
+        rindex = [0] * n
+        numSCCs = _run_without_gc(_pearce_SCCs, xrange(n), rindex,
+                                  self._targets, self._offsets)
+        return (array("l", (n - 1 - r for r in rindex)), numSCCs)
+
+    def _csr_arrays(self, reverse=False):
+        arrays = (self.vertices, self._out_edges.offsets,
+                  self._out_edges.targets)
+        if not reverse:
+            return arrays
+        if self._in_edges is None:
+            self.reverse_graph()
+            self.reverse_graph()
+        return arrays + (self._in_edges.offsets, self._in_edges.targets)
+
+    @property
+    def vertices(self):
+        if self._labels is not None:
+            return self._labels
+        return xrange(self._first, self._first + self.num_vertices)
+
+    def reverse_graph(self):
+        """
+        Reverses the graph (i.e. reverses the direction of all edges).
+        The reversed CSR arrays are built by a counting-sort of the edges on
+        their targets, and cached after the first call.
+        """
+        if self._in_edges is None:
+            self._in_edges = _CSRAdjacency(self, *_transpose_csr(
+                self.num_vertices, self._out_edges.offsets,
+                self._out_edges.targets))
+        self._out_edges, self._in_edges = self._in_edges, self._out_edges
+        self._offsets = self._out_edges.offsets
+        self._targets = self._out_edges.targets
+
+    def __repr__(self):
+        return "CSRGraph(|V|={}, |E|={})".format(self.num_vertices,
+                                                 self.num_edges)
+
+
+class _CSRAdjacency:
+    """
+    Read-only dict-like view { vertex => [outgoing-edges] } of CSR arrays,
+    used as CSRGraph._out_edges. The lists are built on access.
+    """
+    def __init__(self, graph, offsets, targets):
+        self._graph = graph
+        self.offsets = offsets
+        self.targets = targets
+
+    def __getitem__(self, v):
+        graph = self._graph
+        i = graph._vertex_index(v)
+        neighbors = self.targets[self.offsets[i]:self.offsets[i+1]]
+        if graph._labels is not None:
+            labels = graph._labels
+            return [labels[t] for t in neighbors]
+        if graph._first == 0:
+            return neighbors.tolist()
+        first = graph._first
+        return [t + first for t in neighbors]
+
+    def __contains__(self, v):
+        try:
+            self._graph._vertex_index(v)
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return self._graph.num_vertices
+
+    def __iter__(self):
+        return iter(self._graph.vertices)
+
+    def iteritems(self):
+        for v in self._graph.vertices:
+            yield (v, self[v])
+
+
+class IncrementalSCC:
+    """
+    Maintains the SCCs of a directed graph, and a topological-order of its
+    condensation (the DAG of SCCs), as edges are inserted one at a time.
+    Uses the dynamic topological-sort algorithm of Pearce and Kelly ("A
+    dynamic topological sort algorithm for directed acyclic graphs", 2006),
+    extended to merge the SCCs on a cycle closed by an insertion:
+    Each SCC is identified by its root in a union-find structure, and has a
+    position in the topological order. Inserting an edge u -> v only does
+    any work if it goes "backwards", from position ub down to position lb:
+    then F is the set of SCCs reachable from v, and B the set of SCCs from
+    which u is reachable, both with positions within [lb, ub]. If F and B
+    don't overlap, the positions of B ∪ F are reassigned to B and then to F
+    (each in its previous order). Otherwise the edge closed a cycle, and the
+    SCCs C = F ∩ B are merged into one SCC M, and the positions are
+    reassigned to B\C, M and F\C.
+    Only the affected region of the order is visited, so the amortized cost
+    of an insertion is far below recomputing the SCCs.
+    """
+    def __init__(self, vertices=()):
+        """
+        Initialize with the specified vertices (and no edges).
+        """
+        # The SCCs are tracked by the element-indexes of the union-find
+        # structure, so the state of each SCC root is held in lists.
+        self._components = UnionFind() # vertex => SCC root
+        self._out_edges = [] # SCC root => [heads of outgoing-edges]
+        self._in_edges = []  # SCC root => [tails of incoming-edges]
+        self._position = []  # SCC root => position in the topological order
+        self._next_position = 0
+        self.num_edges = 0
+        for v in vertices:
+            self.add_vertex(v)
+
+    def add_vertex(self, v):
+        """
+        Adds the vertex v (as a new SCC at the end of the topological order),
+        if not already present.
+        """
+        if v in self._components:
+            return
+        self._components.add_singleton(v)
+        self._out_edges.append([])
+        self._in_edges.append([])
+        self._position.append(self._next_position)
+        self._next_position += 1
+
+    def add_edge(self, u, v):
+        """
+        Inserts the edge u -> v (adding the vertices, if not already present).
+        Returns True if the edge closed a cycle, merging SCCs.
+        """
+        self.add_vertex(u)
+        self.add_vertex(v)
+        self.num_edges += 1
+        index = self._components._index
+        find = self._components._find
+        i, j = index[u], index[v]
+        ru, rv = find(i), find(j)
+        self._out_edges[ru].append(j)
+        self._in_edges[rv].append(i)
+        position = self._position
+        lb, ub = position[rv], position[ru]
+        if ru == rv or ub < lb:
+            return False
+        # The edge goes backwards in the order: search the affected region
+        F = self._search(rv, self._out_edges, lambda p: p <= ub)
+        if ru not in F:
+            B = self._search(ru, self._in_edges, lambda p: p > lb)
+            self._reorder(sorted(B, key=position.__getitem__) +
+                          sorted(F, key=position.__getitem__))
+            return False
+        B = self._search(ru, self._in_edges, lambda p: p >= lb)
+        C = F & B
+        M = self._merge(C)
+        self._reorder(sorted(B - C, key=position.__getitem__) + [M] +
+                      sorted(F - C, key=position.__getitem__))
+        return True
+
+    def _search(self, source, edges, inRange):
+        """
+        Returns the set of SCC roots reachable from the SCC root source by
+        the edges (self._out_edges or self._in_edges), through SCCs whose
+        position satisfies inRange.
+        The edge-lists of the visited SCCs are compacted along the way: each
+        one is replaced by the list of (distinct) other SCCs it leads to.
+        """
+        find = self._components._find
+        position = self._position
+        visited = set([source])
+        stack = [source]
+        while stack:
+            x = stack.pop()
+            compacted = set()
+            for w in edges[x]:
+                r = find(w)
+                if r == x or r in compacted:
+                    continue
+                compacted.add(r)
+                if r not in visited and inRange(position[r]):
+                    visited.add(r)
+                    stack.append(r)
+            edges[x] = list(compacted)
+        return visited
+
+    def _merge(self, roots):
+        """
+        Merges the SCCs with the specified roots. Returns the new root.
+        """
+        components = self._components
+        roots = list(roots)
+        for r in roots[1:]:
+            components._union(roots[0], r)
+        M = components._find(roots[0])
+        # Concatenate the edge-lists into the largest ones
+        for edges in (self._out_edges, self._in_edges):
+            merged = max((edges[r] for r in roots), key=len)
+            for r in roots:
+                if edges[r] is not merged:
+                    merged.extend(edges[r])
+                edges[r] = None
+            edges[M] = merged
+        return M
+
+    def _reorder(self, roots):
+        """
+        Reassigns the positions of the SCCs in roots to them, in increasing
+        order (a merged SCC keeps the position of its new root).
+        """
+        position = self._position
+        slots = sorted(position[r] for r in roots)
+        for (r, p) in zip(roots, slots):
+            position[r] = p
+
+    def component(self, v):
+        """
+        Returns the root vertex which identifies the SCC of the vertex v.
+        """
+        return self._components.find_root(v)
+
+    @property
+    def num_vertices(self):
+        return len(self._components)
+
+    @property
+    def num_SCCs(self):
+        return self._components.num_disjoint_sets
+
+    def _roots(self):
+        """
+        Returns the element-indexes of the SCC roots, in topological-order.
+        """
+        find = self._components._find
+        roots = [i for i in xrange(len(self._position)) if find(i) == i]
+        roots.sort(key=self._position.__getitem__)
+        return roots
+
+    def topological_order(self):
+        """
+        Returns the list of the SCC roots, sorted in a topological-order of
+        the condensation.
+        """
+        labels = self._components._labels
+        return [labels[r] for r in self._roots()]
+
+    def SCCs(self):
+        """
+        Returns the SCCs as a list of sets, in topological-order.
+        """
+        index = dict((r, k) for (k, r) in enumerate(self._roots()))
+        SCCs = [set() for r in index]
+        find = self._components._find
+        for (i, v) in enumerate(self._components._labels):
+            SCCs[index[find(i)]].add(v)
+        return SCCs
+
+    def __repr__(self):
+        return "IncrementalSCC(|V|={}, |E|={}, |SCCs|={})".format(
+            self.num_vertices, self.num_edges, self.num_SCCs)
+
+
+# Size of the blocks in which edge-list files are read and parsed
+_READ_BLOCK_SIZE = 1 << 22
+
+def _read_edge_list(filename):
+    """
+    Reads and parses an edge-list file (each line: a vertex followed by its
+    out-neighbors), in blocks of _READ_BLOCK_SIZE bytes.
+    Returns (sources, us, vs, numBytes): the arrays of the vertices starting a
+    line and of the edges us[i] -> vs[i], and the size of the file.
+    """
+    sources, us, vs = array("l"), array("l"), array("l")
+    numBytes = 0
+    with open(filename, "rb") as FILE:
+        rest = "" # partial last line of the previous block
+        while True:
+            block = FILE.read(_READ_BLOCK_SIZE)
+            if not block:
+                break
+            numBytes += len(block)
+            end = block.rfind("\n") + 1
+            if end == 0:
+                rest += block
+                continue
+            for (part, arr) in izip(_parse_edge_block(rest + block[:end]),
+                                    (sources, us, vs)):
+                arr.extend(part)
+            rest = block[end:]
+        if rest.strip():
+            for (part, arr) in izip(_parse_edge_block(rest + "\n"),
+                                    (sources, us, vs)):
+                arr.extend(part)
+    return (sources, us, vs, numBytes)
+
+
+def _parse_edge_block(block):
+    """
+    Parses a block of whole lines of an edge-list file. Returns the arrays
+    (sources, us, vs), as in _read_edge_list().
+    With numpy, the block is tokenized at once: the tokens are located by
+    their first character, and the lines by their newline, which gives the
+    number of tokens on each line without splitting it.
+    """
+    if np is not None:
+        chars = np.frombuffer(block, dtype=np.uint8)
+        isSpace = chars <= 32
+        isStart = ~isSpace
+        isStart[1:] &= isSpace[:-1]
+        tokenStarts = np.flatnonzero(isStart)
+        # lineEnds[i] = number of tokens before the end of line i
+        lineEnds = np.searchsorted(tokenStarts, np.flatnonzero(chars == 10))
+        tokens = np.fromstring(block, dtype=np.dtype("l"), sep=" ")
+        if len(tokens) == len(tokenStarts):
+            counts = np.diff(np.concatenate(([0], lineEnds)))
+            nonEmpty = counts > 0
+            firsts = (lineEnds - counts)[nonEmpty]
+            sources = tokens[firsts]
+            us = np.repeat(sources, counts[nonEmpty] - 1)
+            isTarget = np.ones(len(tokens), dtype=bool)
+            isTarget[firsts] = False
+            return tuple(array("l", a.tostring()) \
+                         for a in (sources, us, tokens[isTarget]))
+        # Not only integers: let int() report the error below
+    sources, us, vs = array("l"), array("l"), array("l")
+    addSource, addU, addV = sources.append, us.append, vs.append
+    for line in block.splitlines():
+        l = line.split()
+        if len(l) == 2:
+            vertex = int(l[0])
+            addSource(vertex)
+            addU(vertex)
+            addV(int(l[1]))
+        elif l:
+            vertex = int(l[0])
+            addSource(vertex)
+            us.extend(array("l", [vertex]) * (len(l) - 1))
+            vs.extend(imap(int, l[1:]))
+    return (sources, us, vs)
+
+
+def _csr_from_edges(n, us, vs):
+    """
+    Builds the CSR arrays (offsets, targets) of the graph with the vertices
+    0..n-1 and the edges us[i] -> vs[i], by a (stable) counting-sort of the
+    edges on their source.
+    """
+    m = len(us)
+    if np is not None and m:
+        sourceIds = np.frombuffer(us, dtype=np.int32)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sourceIds, minlength=n), out=offsets[1:])
+        order = np.argsort(sourceIds, kind="mergesort")
+        targets = np.frombuffer(vs, dtype=np.int32)[order]
+        return (array("l", offsets.tolist()), array("i", targets.tostring()))
+    offsets = array("l", [0]) * (n + 1)
+    for u in us:
+        offsets[u+1] += 1
+    for i in xrange(n):
+        offsets[i+1] += offsets[i]
+    position = offsets[:-1] # next free slot of each vertex
+    targets = array("i", [0]) * m
+    for j in xrange(m):
+        u = us[j]
+        targets[position[u]] = vs[j]
+        position[u] += 1
+    return (offsets, targets)
+
+
+def _transpose_csr(n, offsets, targets):
+    """
+    Returns the CSR arrays (offsets, targets) of the reverse of the graph with
+    the vertices 0..n-1 and the CSR arrays (offsets, targets).
+    """
+    sources = array("i")
+    for i in xrange(n):
+        sources.extend(array("i", [i]) * (offsets[i+1] - offsets[i]))
+    return _csr_from_edges(n, targets, sources)
+
+
+def _run_without_gc(fn, *args):
+    """
+    Returns fn(*args), with the cyclic garbage collector paused: the DFS
+    paths of the SCC algorithms can hold a tuple (or an adjacency-list and its
+    iterator) per vertex, which it would otherwise rescan over and over.
+    """
+    gcEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        return fn(*args)
+    finally:
+        if gcEnabled:
+            gc.enable()
+
+
+def _pearce_SCCs(vertices, rindex, adjacency, offsets=None):
+    """
+    Finds the SCCs of a graph using the iterative form of Pearce's variant of
+    Tarjan's algorithm ("A space-efficient algorithm for finding strongly
+    connected components", 2016).
+    vertices  => The vertices of the graph (labels, or indexes 0..n-1).
+    rindex    => Mapping (dict or list) of every vertex to 0.
+    adjacency => adjacency[v] is the sequence of out-neighbors of v; or, if
+                 offsets is specified, the targets array of CSR arrays.
+    rindex replaces Tarjan's visit-index, lowlink and on-stack flag: it holds
+    the visit-index (from 1, 0 = unvisited) of a vertex on the DFS path, the
+    smallest visit-index it reaches, or, once its SCC is done, an SCC number
+    counted down from n-1 (larger than any visit-index in use, so finished
+    vertices never lower a lowlink).
+    The current vertex is kept in local variables, with an iterator over its
+    out-neighbors as its edge-cursor; the DFS path only holds one entry per
+    vertex (not per edge), to resume from when its child is done.
+    Fills rindex with n-1-(SCC index) for each vertex, where the SCCs are
+    indexed in the order they are completed (i.e. in reverse
+    topological-order), and returns the number of SCCs.
+    """
+    path = []     # (vertex, visit-index, edge-cursor) of the ancestors of v
+    sccStack = [] # visited vertices not yet assigned to an SCC
+    index = 1
+    c = len(rindex) - 1
+    for r in vertices:
+        if rindex[r]:
+            continue
+        v = r
+        vIndex = rv = rindex[v] = index
+        index += 1
+        if offsets is None:
+            edges = iter(adjacency[v])
+        else:
+            edges = iter(adjacency[offsets[v]:offsets[v+1]])
+        while True:
+            # Scan the edges of v until an unvisited vertex w is found
+            for w in edges:
+                rw = rindex[w]
+                if rw < rv:
+                    if rw == 0:
+                        break
+                    rv = rw
+            else:
+                # Done with v
+                if rv == vIndex:
+                    # v is the root of an SCC: pop its other vertices
+                    index -= 1
+                    while sccStack and vIndex <= rindex[sccStack[-1]]:
+                        rindex[sccStack.pop()] = c
+                        index -= 1
+                    rv = rindex[v] = c
+                    c -= 1
+                else:
+                    rindex[v] = rv
+                    sccStack.append(v)
+                if not path:
+                    break
+                # Resume the parent of v
+                childRv = rv
+                v, vIndex, edges = path.pop()
+                rv = rindex[v]
+                if childRv < rv:
+                    rv = childRv
+                continue
+            # Descend into w
+            rindex[v] = rv
+            path.append((v, vIndex, edges))
+            v = w
+            vIndex = rv = rindex[v] = index
+            index += 1
+            if offsets is None:
+                edges = iter(adjacency[v])
+            else:
+                edges = iter(adjacency[offsets[v]:offsets[v+1]])
+    return len(rindex) - 1 - c
+
+# Subproblems of forward_backward_SCCs with at most that many vertices are
+# always solved directly
+_FB_MIN_SUBPROBLEM = 1 << 10
+
+# Color of the vertices already assigned to an SCC
+_FB_DONE = -1
+
+# The shared arrays of forward_backward_SCCs, as seen by the worker processes:
+# (offsets, targets, inOffsets, inTargets, colors)
+_fb_shared = None
+
+def _init_fb_worker(shared):
+    global _fb_shared
+    _fb_shared = shared
+
+
+def _shared_copy(arr):
+    """
+    Returns a copy of the array arr in shared memory (a ctypes RawArray).
+    """
+    raw = RawArray(arr.typecode, len(arr))
+    if len(arr):
+        ctypes.memmove(ctypes.addressof(raw), arr.buffer_info()[0],
+                       len(arr) * arr.itemsize)
+    return raw
+
+
+def _trim(n, offsets, targets, inOffsets, inTargets, colors):
+    """
+    Repeatedly removes the vertices with no incoming or no outgoing edges
+    (from the remaining vertices), which are singleton SCCs, and marks them as
+    done in colors.
+    Returns a tuple (list of the singleton SCCs, as arrays, array of the
+    remaining vertices).
+    """
+    outDegree = array("l", (offsets[v+1] - offsets[v] for v in xrange(n)))
+    inDegree = array("l", (inOffsets[v+1] - inOffsets[v] for v in xrange(n)))
+    queue = [v for v in xrange(n) if outDegree[v] == 0 or inDegree[v] == 0]
+    removed = bytearray(n)
+    for v in queue:
+        removed[v] = 1
+    SCCs = []
+    while queue:
+        v = queue.pop()
+        colors[v] = _FB_DONE
+        SCCs.append(array("l", [v]))
+        for w in targets[offsets[v]:offsets[v+1]]:
+            inDegree[w] -= 1
+            if inDegree[w] == 0 and not removed[w]:
+                removed[w] = 1
+                queue.append(w)
+        for w in inTargets[inOffsets[v]:inOffsets[v+1]]:
+            outDegree[w] -= 1
+            if outDegree[w] == 0 and not removed[w]:
+                removed[w] = 1
+                queue.append(w)
+    return (SCCs, array("l", (v for v in xrange(n) if not removed[v])))
+
+
+def _fb_task(task):
+    """
+    Pool task of forward_backward_SCCs: processes the subproblem made of the
+    vertices (whose entries in the shared colors array are color).
+    If it is small, finds its SCCs with Tarjan's algorithm. Otherwise finds
+    the SCC of its first vertex (the pivot), by a forward search marking the
+    vertices fwdColor, then a backward search, which marks the vertices
+    reached by both as done, and the other ones bwdColor.
+    Returns a tuple (list of the SCCs found, as arrays, list of the new
+    subproblems, as tuples (vertices, color)).
+    """
+    (vertices, color, fwdColor, bwdColor, small) = task
+    offsets, targets, inOffsets, inTargets, colors = _fb_shared
+    if len(vertices) <= small:
+        return (_induced_SCCs(vertices, color), [])
+    pivot = vertices[0]
+    colors[pivot] = fwdColor
+    stack = [pivot]
+    while stack:
+        v = stack.pop()
+        for w in targets[offsets[v]:offsets[v+1]]:
+            if colors[w] == color:
+                colors[w] = fwdColor
+                stack.append(w)
+    colors[pivot] = _FB_DONE
+    stack = [pivot]
+    while stack:
+        v = stack.pop()
+        for w in inTargets[inOffsets[v]:inOffsets[v+1]]:
+            c = colors[w]
+            if c == fwdColor:
+                colors[w] = _FB_DONE
+                stack.append(w)
+            elif c == color:
+                colors[w] = bwdColor
+                stack.append(w)
+    parts = dict((c, array("l")) for c in (_FB_DONE, fwdColor, bwdColor, color))
+    for v in vertices:
+        parts[colors[v]].append(v)
+    pivotSCC = parts.pop(_FB_DONE)
+    return ([pivotSCC], [(part, c) for (c, part) in parts.iteritems() if part])
+
+
+def _induced_SCCs(vertices, color):
+    """
+    Returns the SCCs (as arrays) of the subgraph induced by the vertices (of
+    the specified color), using _pearce_SCCs, and marks them as done.
+    """
+    offsets, targets, inOffsets, inTargets, colors = _fb_shared
+    adjacency = dict((v, [w for w in targets[offsets[v]:offsets[v+1]] \
+                          if colors[w] == color]) for v in vertices)
+    rindex = dict.fromkeys(vertices, 0)
+    numSCCs = _run_without_gc(_pearce_SCCs, vertices, rindex, adjacency)
+    SCCs = [array("l") for c in xrange(numSCCs)]
+    top = len(vertices) - 1
+    for v in vertices:
+        SCCs[top - rindex[v]].append(v)
+        colors[v] = _FB_DONE
+    return SCCs
+
+
 if __name__ == "__main__":
     graph = Graph("tests/graph4.txt")
     print graph.kosaraju_SCCs()
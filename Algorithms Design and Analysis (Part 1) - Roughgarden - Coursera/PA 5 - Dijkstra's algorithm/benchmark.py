@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the running time of the Dijkstra engines, on input_graph.txt and on
+random graphs "scaled" from it: the same average out-degree and the same
+distribution of edge weights, with more vertices. Then compares point-to-point
+queries with shortest_path() against a full single-source search, and the ALT
+queries of shortest_path_alt() (on the scaled graph, and on a road-like grid
+graph), and the priority-queues of dijkstra() (heapq and bucket-queues).
+Finally, answers bursts of queries from a few hot sources with the cached
+ShortestPathService, and with one shortest_path() per query.
+First checks the ALT queries on a graph with distances beyond 32 bits.
+Usage: python benchmark.py [number of edges of the scaled graph] [sources]
+                           [point-to-point queries] [landmarks]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from dijkstra import Graph, LandmarkIndex, ShortestPathService, \
+                     _bidirectional_dijkstra, _astar
+
+def scaled_graph(g, num_edges, rng):
+    """
+    Returns a random graph with about num_edges edges, with the average
+    out-degree of the graph g, and edge weights sampled from the weights of g.
+    """
+    weights = [e.weight for v in g.vertices for e in g._out_edges[v]]
+    degree = float(g.num_edges) / g.num_vertices
+    n = max(2, int(num_edges / degree))
+    scaled = Graph()
+    for i in xrange(num_edges):
+        scaled.add_edge(rng.randint(1, n), rng.randint(1, n),
+                        rng.choice(weights))
+    return scaled
+
+
+def grid_graph(side, weights, rng):
+    """
+    Returns a side x side grid graph, with edges in both directions between
+    neighbors, and weights sampled from the list weights.
+    """
+    g = Graph()
+    for i in xrange(side):
+        for j in xrange(side):
+            v = i * side + j
+            for w in ([v + 1] if j + 1 < side else []) + \
+                     ([v + side] if i + 1 < side else []):
+                g.add_edge(v, w, rng.choice(weights))
+                g.add_edge(w, v, rng.choice(weights))
+    return g
+
+
+def timed(fn, *args, **kwargs):
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return (result, time.time() - start)
+
+
+def benchmark(name, g, sources):
+    g._dense_arrays() # build the dense representation up-front
+    heapTime = denseTime = 0.0
+    for src in sources:
+        (distances, t) = timed(g.dijkstra, src, "heap")
+        heapTime += t
+        (denseDistances, t) = timed(g.dijkstra_dense, src)
+        denseTime += t
+        assert denseDistances == distances
+    print "{:<32} dijkstra: {:6.3f}s   dijkstra_dense: {:6.3f}s   " \
+          "speedup {:.1f}x".format(name, heapTime / len(sources),
+                                   denseTime / len(sources),
+                                   heapTime / denseTime)
+
+
+def benchmark_queues(name, g, sources):
+    times = {}
+    for queue in ("heap", "dial", "radix"):
+        start = time.time()
+        results = [g.dijkstra(src, queue) for src in sources]
+        times[queue] = (time.time() - start) / len(sources)
+        if queue == "heap":
+            expected = results
+        assert results == expected
+    print "{:<32} dijkstra with heap: {:6.3f}s   dial: {:6.3f}s   " \
+          "radix: {:6.3f}s   (default: {})".format(name, times["heap"],
+          times["dial"], times["radix"], g.weight_stats.queue())
+
+
+def benchmark_queries(g, pairs):
+    labels, ids, offsets, targets, weights = g._dense_arrays()
+    backward = g._reverse_dense_arrays()
+    fullTime = queryTime = 0.0
+    settled = reachable = 0
+    for (src, dst) in pairs:
+        (distances, t) = timed(g.dijkstra_dense, src)
+        fullTime += t
+        reachable += len(distances)
+        ((distance, path), t) = timed(g.shortest_path, src, dst)
+        queryTime += t
+        assert distance == distances.get(dst)
+        settled += _bidirectional_dijkstra(ids[src], ids[dst],
+                                           (offsets, targets, weights),
+                                           backward)[4]
+    print "{} queries: dijkstra_dense: {:6.3f}s   shortest_path: {:6.4f}s   " \
+          "speedup {:.0f}x, settling {:.2%} of the vertices".format(
+          len(pairs), fullTime / len(pairs), queryTime / len(pairs),
+          fullTime / queryTime, float(settled) / reachable)
+
+
+def benchmark_alt(g, pairs, k):
+    index = LandmarkIndex()
+    buildTime = timed(index.build, g, k)[1]
+    (fd, filename) = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        index.save(filename)
+        (index, loadTime) = timed(LandmarkIndex, filename)
+        print "{}: {} landmarks, built in {:.1f}s, {:.1f} MB, loaded in " \
+              "{:.4f}s".format(g, len(index.landmarks), buildTime,
+                               os.path.getsize(filename) / 1e6, loadTime)
+        labels, ids, offsets, targets, weights = g._dense_arrays()
+        forward = (offsets, targets, weights)
+        backward = g._reverse_dense_arrays()
+        bidirTime = altTime = 0.0
+        bidirSettled = altSettled = 0
+        for (src, dst) in pairs:
+            ((distance, path), t) = timed(g.shortest_path, src, dst)
+            bidirTime += t
+            ((altDistance, path), t) = timed(g.shortest_path_alt, src, dst,
+                                             index)
+            altTime += t
+            assert altDistance == distance
+            bidirSettled += _bidirectional_dijkstra(ids[src], ids[dst],
+                                                    forward, backward)[4]
+            altSettled += _astar(ids[src], ids[dst], forward,
+                                 index.lower_bounds_to(ids[dst]))[2]
+        print "{} queries: shortest_path: {:6.4f}s, {:.0f} settled   " \
+              "shortest_path_alt: {:6.4f}s, {:.0f} settled".format(
+              len(pairs), bidirTime / len(pairs),
+              float(bidirSettled) / len(pairs), altTime / len(pairs),
+              float(altSettled) / len(pairs))
+        del index
+    finally:
+        os.remove(filename)
+
+
+def check_large_distances():
+    """
+    Checks the ALT queries on a graph with integer distances beyond 32 bits,
+    whose landmark index is stored as doubles, before and after a reload.
+    """
+    g = Graph()
+    g.add_edge(1, 2, 1 << 31)
+    g.add_edge(2, 3, 5)
+    g.add_edge(3, 1, 1)
+    index = LandmarkIndex()
+    index.build(g, 2, seed=1)
+    (fd, filename) = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        index.save(filename)
+        for idx in (index, LandmarkIndex(filename)):
+            assert idx._typecode == "d"
+            for src in g.vertices:
+                for dst in g.vertices:
+                    assert g.shortest_path_alt(src, dst, idx) == \
+                           g.shortest_path(src, dst)
+            assert g.shortest_path_alt(1, 3, idx) == ((1 << 31) + 5, [1, 2, 3])
+            del idx
+    finally:
+        os.remove(filename)
+
+
+def benchmark_service(g, rng, num_hot=4, num_batches=5, batch_size=100):
+    vertices = sorted(g.vertices)
+    hot = rng.sample(vertices, num_hot)
+    batches = [[(rng.choice(hot), rng.choice(vertices)) \
+                for i in xrange(batch_size)] for b in xrange(num_batches)]
+    # budget for all but one of the hot trees, so some get evicted
+    service = ShortestPathService(g, (num_hot - 1) * 16 * g.num_vertices)
+    serviceTime = queryTime = 0.0
+    for batch in batches:
+        (results, t) = timed(service.query_batch, batch)
+        serviceTime += t
+        start = time.time()
+        expected = [g.shortest_path(src, dst) for (src, dst) in batch]
+        queryTime += time.time() - start
+        assert [d for (d, path) in results] == [d for (d, path) in expected]
+    service.close()
+    print "{} batches of {} queries from {} sources: shortest_path: {:.2f}s" \
+          "   {}: {:.2f}s".format(num_batches, batch_size, num_hot, queryTime,
+                                 service, serviceTime)
+
+
+if __name__ == "__main__":
+    num_edges = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    num_sources = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    num_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    num_landmarks = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+    check_large_distances()
+    rng = random.Random(1)
+    g = Graph("input_graph.txt")
+    benchmark("input_graph.txt {}".format(g), g, sorted(g.vertices))
+    benchmark_queues("input_graph.txt {}".format(g), g, sorted(g.vertices))
+    g = scaled_graph(g, num_edges, rng)
+    benchmark(repr(g), g, rng.sample(sorted(g.vertices), num_sources))
+    benchmark_queues(repr(g), g, rng.sample(sorted(g.vertices), num_sources))
+    vertices = sorted(g.vertices)
+    pairs = [tuple(rng.sample(vertices, 2)) for i in xrange(num_queries)]
+    benchmark_queries(g, pairs)
+    benchmark_alt(g, pairs, num_landmarks)
+    benchmark_service(g, rng)
+    weights = [e.weight for v in g.vertices for e in g._out_edges[v]]
+    g = grid_graph(int((num_edges / 4) ** 0.5), weights, rng)
+    benchmark_queues(repr(g), g, rng.sample(sorted(g.vertices), num_sources))
+    vertices = sorted(g.vertices)
+    pairs = [tuple(rng.sample(vertices, 2)) for i in xrange(num_queries)]
+    benchmark_queries(g, pairs)
+    benchmark_alt(g, pairs, num_landmarks)
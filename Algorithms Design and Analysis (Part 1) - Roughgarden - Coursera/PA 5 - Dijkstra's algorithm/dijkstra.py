@@ -1,6 +1,23 @@
 # -*- coding: utf-8 -*-
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "..", "bucketqueue"))
+from bucketqueue import WeightStats, dial_shortest_distances, \
+                        radix_shortest_distances
+import struct
+import random
+import ctypes
 import collections
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
 from heapq import heappush, heappop
+from itertools import izip
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class Graph:
     Edge = collections.namedtuple("Edge", ("dest", "weight"))
@@ -15,6 +32,9 @@ class Graph:
         self.vertices = set()
         self.num_vertices = 0
         self.num_edges = 0
+        self.weight_stats = WeightStats() # of the weights of all the edges
+        self._dense = None # cached result of _dense_arrays()
+        self._dense_reverse = None # cached result of _reverse_dense_arrays()
         if(filename):
             self.read_from(filename)
     
@@ -34,6 +54,7 @@ class Graph:
                 d,w = edge.split(",")
                 d,w = int(d), int(w)
                 self.vertices.add(d)
+                self.weight_stats.add(w)
                 try:
                     self._out_edges[src].append(Graph.Edge(dest=d, weight=w))
                 except KeyError:
@@ -44,13 +65,42 @@ class Graph:
         for v in self.vertices:
             if v not in self._out_edges: self._out_edges[v] = []
         self.num_vertices = len(self.vertices)
+        self._dense = None
+        self._dense_reverse = None
 
-    def dijkstra(self, src):
+    def add_edge(self, src, dest, weight):
+        """
+        Adds the edge src -> dest with the specified weight (and the vertices
+        src and dest if they aren't already present).
+        """
+        for v in (src, dest):
+            if v not in self._out_edges:
+                self._out_edges[v] = []
+                self.vertices.add(v)
+        self._out_edges[src].append(Graph.Edge(dest=dest, weight=weight))
+        self.weight_stats.add(weight)
+        self.num_edges += 1
+        self.num_vertices = len(self.vertices)
+        self._dense = None
+        self._dense_reverse = None
+
+    def dijkstra(self, src, queue=None):
         """
         Runs Dijkstra's algorithm to find the shortest distance from src to all
         vertices reachable from it.
+        queue => Priority-queue of the frontier: "heap" (a binary heap),
+                 "dial" or "radix" (monotone bucket-queues, for non-negative
+                 integer weights, see the bucketqueue module). By default it
+                 is chosen from the statistics of the weights.
         Returns the result as a dictionary (vertex => distance)
         """
+        if queue is None:
+            queue = self.weight_stats.queue()
+        if queue == "dial":
+            return dial_shortest_distances(self._out_edges, src,
+                                           self.weight_stats.max_weight)
+        if queue == "radix":
+            return radix_shortest_distances(self._out_edges, src)
         frontier = [] # heap data-structure to track the best potential edges to explore
         explored = set()
         distances = {}
@@ -66,4 +116,708 @@ class Graph:
                     heappush( frontier, \
                               Graph.FrontierEntry(vertex=dest, distance=dist+weight) )
         return distances
-        
\ No newline at end of file
+        
+
+    def dijkstra_dense(self, src, as_array=False):
+        """
+        Runs Dijkstra's algorithm like dijkstra(), on the dense representation
+        of the graph (see _dense_arrays), with an indexed binary heap that
+        holds each vertex at most once and supports decrease-key.
+        Returns the result as a dictionary (vertex => distance), or if as_array
+        is set, as two arrays indexed by the vertex indexes (see
+        vertex_index): the distances (of the same type as the weights, see
+        _dense_arrays), and the predecessors on the shortest paths (both -1
+        for the vertices unreachable from src, and the predecessor of src is
+        -1).
+        """
+        labels, ids, offsets, targets, weights = self._dense_arrays()
+        distances, predecessors = _dijkstra_indexed_heap(ids[src], offsets,
+                                                         targets, weights)
+        if as_array:
+            return (array(weights.typecode, distances),
+                    array("l", predecessors))
+        return dict((labels[i], d) for (i, d) in enumerate(distances) \
+                    if d >= 0)
+
+    def shortest_path(self, src, dst):
+        """
+        Returns (distance, path) for a shortest path from src to dst, where
+        path is the list of vertices from src to dst, or (None, []) if dst is
+        unreachable from src.
+        Runs a bidirectional Dijkstra (see _bidirectional_dijkstra), which
+        stops as soon as the two searches have provably met, instead of
+        settling every vertex reachable from src.
+        """
+        labels, ids, offsets, targets, weights = self._dense_arrays()
+        (distance, meet, forwardPreds, backwardPreds, numSettled) = \
+            _bidirectional_dijkstra(ids[src], ids[dst],
+                                    (offsets, targets, weights),
+                                    self._reverse_dense_arrays())
+        if distance is None:
+            return (None, [])
+        path = _unwind_path(labels, forwardPreds, meet)
+        path.reverse()
+        return (distance, path + _unwind_path(labels, backwardPreds,
+                                              backwardPreds[meet]))
+
+    def shortest_path_alt(self, src, dst, index):
+        """
+        Same as shortest_path(), with an A* search guided by the lower bounds
+        of the LandmarkIndex index (built for this graph), which explores far
+        fewer vertices on graphs with a geometric structure (e.g. roads).
+        """
+        if (index.num_vertices, index.num_edges) != (self.num_vertices,
+                                                     self.num_edges):
+            raise ValueError("{} wasn't built for {}".format(index, self))
+        labels, ids, offsets, targets, weights = self._dense_arrays()
+        (distance, predecessors, numSettled) = _astar(
+            ids[src], ids[dst], (offsets, targets, weights),
+            index.lower_bounds_to(ids[dst]))
+        if distance is None:
+            return (None, [])
+        path = _unwind_path(labels, predecessors, ids[dst])
+        path.reverse()
+        return (distance, path)
+
+    def vertex_index(self, v):
+        """
+        Returns the index of the vertex v in the dense representation of the
+        graph: the vertices are indexed 0..n-1 in increasing order.
+        """
+        return self._dense_arrays()[1][v]
+
+    def vertex_labels(self):
+        """
+        Returns the list of the vertices, by index (see vertex_index).
+        """
+        return self._dense_arrays()[0]
+
+    def _dense_arrays(self):
+        """
+        Returns (labels, ids, offsets, targets, weights): the vertices mapped
+        to the indexes 0..n-1 (labels: index => vertex, ids: vertex => index),
+        and the out-edges in compressed-sparse-row arrays: the out-edges of the
+        vertex with index i go to targets[j] with weight weights[j], for
+        offsets[i] <= j < offsets[i+1].
+        The weights are machine-integers if all the weights of the graph are
+        integers (see weight_stats), and doubles otherwise.
+        Built on the first call, and cached until the graph is modified.
+        """
+        if self._dense is None:
+            labels = sorted(self.vertices)
+            ids = dict(izip(labels, xrange(len(labels))))
+            offsets = array("l", [0])
+            targets = array("l")
+            weights = array("l" if self.weight_stats.integral else "d")
+            for v in labels:
+                for dest, weight in self._out_edges[v]:
+                    targets.append(ids[dest])
+                    weights.append(weight)
+                offsets.append(len(targets))
+            self._dense = (labels, ids, offsets, targets, weights)
+        return self._dense
+
+    def _reverse_dense_arrays(self):
+        """
+        Returns the CSR arrays (offsets, sources, weights) of the in-edges:
+        the in-edges of the vertex with index i come from sources[j] with
+        weight weights[j], for offsets[i] <= j < offsets[i+1].
+        Built on the first call (by a counting-sort of the out-edges on their
+        targets), and cached until the graph is modified.
+        """
+        if self._dense_reverse is None:
+            labels, ids, offsets, targets, weights = self._dense_arrays()
+            n = len(labels)
+            inOffsets = array("l", [0]) * (n + 1)
+            for t in targets:
+                inOffsets[t+1] += 1
+            for i in xrange(n):
+                inOffsets[i+1] += inOffsets[i]
+            position = inOffsets[:-1] # next free slot of each vertex
+            sources = array("l", [0]) * len(targets)
+            inWeights = array(weights.typecode, [0]) * len(targets)
+            for v in xrange(n):
+                for j in xrange(offsets[v], offsets[v+1]):
+                    t = targets[j]
+                    k = position[t]
+                    sources[k] = v
+                    inWeights[k] = weights[j]
+                    position[t] = k + 1
+            self._dense_reverse = (inOffsets, sources, inWeights)
+        return self._dense_reverse
+
+    def __repr__(self):
+        return "Graph(|V|={}, |E|={})".format(self.num_vertices, self.num_edges)
+
+
+class LandmarkIndex:
+    """
+    Precomputed index for ALT queries (A*, landmarks, triangle inequality):
+    for k landmark vertices L, the distances d(L, v) and d(v, L) to and from
+    every vertex v, which give the lower bounds
+        d(v, t) >= d(L, t) - d(L, v)    and    d(v, t) >= d(v, L) - d(t, L)
+    on the distance between any two vertices v and t.
+    The distances are stored in a table (-1 when unreachable), with one row
+    of 2k entries per vertex-index (see Graph.vertex_index):
+    [d(L0, v), ..., d(Lk-1, v), d(v, L0), ...], so a query reads the bounds
+    of a vertex in one contiguous slice. The table holds 32-bit integers, or
+    doubles (exact up to 2^53) if the weights of the graph aren't all
+    integers or some distances don't fit in 32 bits.
+    The index is saved in a compact binary file, which is memory-mapped when
+    loaded (with numpy, or read into an array otherwise).
+    """
+    MAGIC = "DIJKALT1" # table of 32-bit integers
+    MAGIC_FLOAT = "DIJKALTD" # table of doubles
+    # typecode => (magic, numpy dtype) of the table
+    _TABLE_TYPES = {"i": (MAGIC, "<i4"), "d": (MAGIC_FLOAT, "<f8")}
+    # largest distance stored in a table of 32-bit integers
+    _INT32_MAX = (1 << 31) - 1
+    # magic, number of vertices, number of edges, number of landmarks
+    _HEADER = struct.Struct("<8sqqq")
+
+    def __init__(self, filename=None):
+        """
+        Initialize an index by loading it from the specified file, or an
+        empty index (see build) if unspecified.
+        """
+        self.landmarks = [] # vertex-indexes of the landmarks
+        self.num_vertices = 0
+        self.num_edges = 0
+        self._typecode = "i" # of the table
+        self._table = array("i")
+        if(filename):
+            self.load(filename)
+
+    def build(self, graph, k=8, seed=None):
+        """
+        Builds the index of the graph, with k landmarks picked by farthest-point
+        selection: the first landmark is the vertex farthest from a random
+        vertex, and each next one the vertex farthest from the landmarks
+        already picked (vertices unreachable from them are ignored).
+        Runs 2k+1 Dijkstra searches.
+        """
+        labels, ids, offsets, targets, weights = graph._dense_arrays()
+        inOffsets, sources, inWeights = graph._reverse_dense_arrays()
+        n = len(labels)
+        k = min(k, n)
+        width = 2 * k
+        typecode = "i" if graph.weight_stats.integral else "d"
+        table = array(typecode, [0]) * (n * width)
+        rng = random.Random(seed)
+        # closest[v] = distance to v from the closest landmark (from the
+        # random start vertex at first), or -1 if unreachable
+        closest = _dijkstra_indexed_heap(rng.randrange(n), offsets, targets,
+                                         weights)[0] if n else []
+        landmarks = []
+        for i in xrange(k):
+            landmark = closest.index(max(closest))
+            if closest[landmark] <= 0 and landmarks:
+                # Every reachable vertex is a landmark: pick the next one
+                # among the vertices not reached yet, if any
+                if -1 not in closest:
+                    break
+                landmark = closest.index(-1)
+            landmarks.append(landmark)
+            fromLandmark = _dijkstra_indexed_heap(landmark, offsets, targets,
+                                                  weights)[0]
+            toLandmark = _dijkstra_indexed_heap(landmark, inOffsets, sources,
+                                                inWeights)[0]
+            if typecode == "i" and max(max(fromLandmark), max(toLandmark)) \
+                                   > self._INT32_MAX:
+                # The distances overflow 32 bits: switch to doubles
+                typecode = "d"
+                table = array(typecode, table)
+            table[i::width] = array(typecode, fromLandmark)
+            table[k+i::width] = array(typecode, toLandmark)
+            if i == 0:
+                closest = fromLandmark
+            else:
+                closest = [c if d < 0 or 0 <= c <= d else d \
+                           for (c, d) in izip(closest, fromLandmark)]
+        if len(landmarks) < k:
+            # Drop the unused columns
+            k = len(landmarks)
+            table = array(typecode, (table[v*width + j] for v in xrange(n) \
+                                for j in range(k) + range(width/2, width/2+k)))
+        self.landmarks = landmarks
+        self.num_vertices = n
+        self.num_edges = graph.num_edges
+        self._typecode = typecode
+        self._table = table
+
+    def save(self, filename):
+        """
+        Saves the index to the specified file: a header, the landmarks, then
+        the table, all little-endian.
+        """
+        typecode = self._typecode
+        header = self._HEADER.pack(self._TABLE_TYPES[typecode][0],
+                                   self.num_vertices, self.num_edges,
+                                   len(self.landmarks))
+        landmarks = array("i", self.landmarks)
+        table = self._table
+        if not isinstance(table, array):
+            # memory-mapped table (the numpy dtypes "i" and "d" are native,
+            # like the array typecodes)
+            table = array(typecode,
+                          np.asarray(table, dtype=typecode).tostring())
+        if sys.byteorder != "little":
+            landmarks.byteswap()
+            table = array(typecode, table)
+            table.byteswap()
+        with open(filename, "wb") as FILE:
+            FILE.write(header)
+            landmarks.tofile(FILE)
+            table.tofile(FILE)
+
+    def load(self, filename):
+        """
+        Loads the index from the specified file (see save). With numpy, the
+        table is memory-mapped rather than read: loading is immediate, and
+        only the rows used by the queries are paged in.
+        """
+        with open(filename, "rb") as FILE:
+            header = FILE.read(self._HEADER.size)
+            if len(header) != self._HEADER.size:
+                raise ValueError("{} is not a landmark index".format(filename))
+            (magic, n, m, k) = self._HEADER.unpack(header)
+            typecode = "i" if magic == self.MAGIC else "d"
+            if magic != self._TABLE_TYPES[typecode][0]:
+                raise ValueError("{} is not a landmark index".format(filename))
+            landmarks = array("i")
+            landmarks.fromfile(FILE, k)
+            if np is not None:
+                table = np.memmap(filename, mode="r", offset=FILE.tell(),
+                                  dtype=self._TABLE_TYPES[typecode][1],
+                                  shape=(n * 2 * k,))
+            else:
+                table = array(typecode)
+                table.fromfile(FILE, n * 2 * k)
+        if sys.byteorder != "little":
+            landmarks.byteswap()
+            if np is None:
+                table.byteswap()
+        self.landmarks = landmarks.tolist()
+        self.num_vertices = n
+        self.num_edges = m
+        self._typecode = typecode
+        self._table = table
+
+    def _row(self, v):
+        """
+        Returns the row of the table for the vertex-index v, as a list.
+        """
+        width = 2 * len(self.landmarks)
+        return self._table[v*width:(v+1)*width].tolist()
+
+    def lower_bounds_to(self, t):
+        """
+        Returns a function of a vertex-index v, which returns a lower bound on
+        the distance from v to the vertex-index t (or None if the landmarks
+        prove that t is unreachable from v: some landmark reaches v but not t,
+        or is reached from t but not from v).
+        """
+        k = len(self.landmarks)
+        row = self._row
+        targetRow = row(t)
+        pairs = zip(xrange(k), targetRow[:k], targetRow[k:])
+        def lower_bound(v):
+            vRow = row(v)
+            bound = 0
+            for (i, fromLandmark, toLandmark) in pairs:
+                d = vRow[i]
+                if d >= 0:
+                    if fromLandmark < 0:
+                        return None # L reaches v but not t
+                    if fromLandmark - d > bound:
+                        bound = fromLandmark - d
+                if toLandmark >= 0:
+                    d = vRow[k+i]
+                    if d < 0:
+                        return None # t reaches L but v doesn't
+                    if d - toLandmark > bound:
+                        bound = d - toLandmark
+            return bound
+        return lower_bound
+
+    def __repr__(self):
+        return "LandmarkIndex(|V|={}, |E|={}, |landmarks|={})".format(
+               self.num_vertices, self.num_edges, len(self.landmarks))
+
+
+class ShortestPathService:
+    """
+    Query layer over a Graph, for bursts of shortest-path queries from a few
+    hot sources: the complete shortest-path tree of each source (the arrays
+    of distances and predecessors of dijkstra_dense) is kept in an LRU cache
+    within a memory budget, so a query from a cached source only walks its
+    path. Batches of queries are grouped by source, and the trees missing
+    from the cache are computed by a pool of processes.
+    The pool, and the copy of the CSR arrays of the graph in shared memory
+    which its processes work on, are created by the first batch that needs
+    them and kept for the next batches, until the graph is modified. Call
+    close() (or use the service as a context manager) to shut the pool down.
+    The counters hits, misses and evictions count the trees found in the
+    cache, computed, and dropped from it to make room.
+    """
+    def __init__(self, graph, memory_budget=64 << 20, workers=None):
+        """
+        graph         => The Graph queried. The cache is cleared whenever
+                         the graph is modified.
+        memory_budget => Maximum size of the cached trees, in bytes.
+        workers       => Number of processes computing the missing trees
+                         of a batch. Defaults to the number of CPUs.
+        """
+        self.graph = graph
+        self.memory_budget = memory_budget
+        self.workers = workers or multiprocessing.cpu_count()
+        # source-index => (distances, predecessors), least recently used first
+        self._trees = collections.OrderedDict()
+        self._dense = None # the dense arrays of the graph the trees are for
+        self._pool = None # pool of processes, working on the shared arrays
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def query(self, src, dst):
+        """
+        Returns (distance, path) for a shortest path from src to dst, as
+        Graph.shortest_path().
+        """
+        return self.query_batch([(src, dst)])[0]
+
+    def query_batch(self, pairs):
+        """
+        Answers the queries (src, dst) in pairs. Returns the list of their
+        (distance, path), as Graph.shortest_path(), in the same order.
+        Each distinct source needs a single tree: from the cache, or computed
+        (in parallel with the other missing ones) and then cached.
+        """
+        dense = self.graph._dense_arrays()
+        if dense is not self._dense:
+            self._trees.clear()
+            self.cached_bytes = 0
+            self.close() # the pool works on the arrays of the old graph
+            self._dense = dense
+        labels, ids, offsets, targets, weights = dense
+        bySource = collections.OrderedDict() # source => [(query, target)]
+        for (i, (src, dst)) in enumerate(pairs):
+            bySource.setdefault(ids[src], []).append((i, ids[dst]))
+        results = [None] * len(pairs)
+        missing = []
+        for (src, queries) in bySource.iteritems():
+            tree = self._trees.pop(src, None)
+            if tree is None:
+                missing.append(src)
+                continue
+            self.hits += 1
+            self._trees[src] = tree # most recently used
+            self._answer(tree, queries, labels, results)
+        self.misses += len(missing)
+        for (src, tree) in izip(missing, self._compute_trees(missing, dense)):
+            self._answer(tree, bySource[src], labels, results)
+            self._cache(src, tree)
+        return results
+
+    @staticmethod
+    def _answer(tree, queries, labels, results):
+        """
+        Stores into results[i] the (distance, path) to the vertex-index dst
+        in the tree, for each (i, dst) in queries.
+        """
+        distances, predecessors = tree
+        for (i, dst) in queries:
+            if distances[dst] < 0:
+                results[i] = (None, [])
+            else:
+                path = _unwind_path(labels, predecessors, dst)
+                path.reverse()
+                results[i] = (distances[dst], path)
+
+    def _cache(self, src, tree):
+        """
+        Adds the tree of the source-index src to the cache, evicting the
+        least recently used trees as needed to stay within the budget (a tree
+        larger than the whole budget isn't cached).
+        """
+        size = sum(a.itemsize * len(a) for a in tree)
+        if size > self.memory_budget:
+            return
+        while self.cached_bytes + size > self.memory_budget:
+            (_, evicted) = self._trees.popitem(last=False)
+            self.cached_bytes -= sum(a.itemsize * len(a) for a in evicted)
+            self.evictions += 1
+        self._trees[src] = tree
+        self.cached_bytes += size
+
+    def close(self):
+        """
+        Shuts down the pool of processes, if any. The service remains usable:
+        the next batch which needs the pool starts a new one.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _compute_trees(self, sources, dense):
+        """
+        Generates the trees (distances, predecessors) of the source-indexes,
+        in order. With several workers and sources, they are computed by the
+        pool of processes, which share the CSR arrays of the graph (both are
+        created on the first call, and reused until the graph is modified).
+        """
+        labels, ids, offsets, targets, weights = dense
+        if self.workers <= 1 or len(sources) <= 1:
+            for src in sources:
+                distances, predecessors = _dijkstra_indexed_heap(
+                    src, offsets, targets, weights)
+                yield (array(weights.typecode, distances),
+                       array("l", predecessors))
+            return
+        if self._pool is None:
+            shared = tuple(_shared_copy(a) for a in (offsets, targets,
+                                                     weights))
+            self._pool = multiprocessing.Pool(self.workers, _init_sssp_worker,
+                                              (shared, weights.typecode))
+        for tree in self._pool.imap(_sssp_task, sources):
+            yield tree
+
+    def __repr__(self):
+        return "ShortestPathService(|trees|={}, {:.1f} MB, hits={}, " \
+               "misses={}, evictions={})".format(len(self._trees),
+               self.cached_bytes / 1e6, self.hits, self.misses,
+               self.evictions)
+
+
+# The shared CSR arrays of ShortestPathService, as seen by the worker
+# processes: (offsets, targets, weights), and the typecode of the weights
+_sssp_shared = None
+_sssp_typecode = None
+
+def _init_sssp_worker(shared, typecode):
+    global _sssp_shared, _sssp_typecode
+    _sssp_shared = shared
+    _sssp_typecode = typecode
+
+
+def _shared_copy(arr):
+    """
+    Returns a copy of the array arr in shared memory (a ctypes RawArray).
+    """
+    raw = RawArray(arr.typecode, len(arr))
+    if len(arr):
+        ctypes.memmove(ctypes.addressof(raw), arr.buffer_info()[0],
+                       len(arr) * arr.itemsize)
+    return raw
+
+
+def _sssp_task(src):
+    """
+    Returns the tree (distances, predecessors) of the source-index src, on
+    the shared CSR arrays.
+    """
+    distances, predecessors = _dijkstra_indexed_heap(src, *_sssp_shared)
+    return (array(_sssp_typecode, distances), array("l", predecessors))
+
+
+def _unwind_path(labels, predecessors, v):
+    """
+    Returns the list of the labels of the vertex-indexes v, predecessors[v],
+    predecessors[predecessors[v]], ... up to -1.
+    """
+    path = []
+    while v != -1:
+        path.append(labels[v])
+        v = predecessors[v]
+    return path
+
+
+def _astar(src, dst, forward, lower_bound):
+    """
+    A* search from the vertex-index src to dst over the CSR arrays forward =
+    (offsets, targets, weights): Dijkstra's algorithm with the frontier
+    ordered by distance + lower_bound(vertex). The lower bounds of
+    LandmarkIndex are consistent, so a vertex is never settled twice.
+    Returns (distance, predecessors, numSettled), with predecessors a dict
+    leading back from dst to src (-1 at src), or distance None if dst is
+    unreachable from src.
+    """
+    bound = lower_bound(src)
+    if bound is None:
+        return (None, {}, 0)
+    distances = {src: 0}
+    predecessors = {src: -1}
+    bounds = {src: bound} # lower-bounds computed so far
+    settled = set()
+    frontier = [(bound, src)]
+    offsets, targets, weights = forward
+    while frontier:
+        v = heappop(frontier)[1]
+        if v in settled:
+            continue # outdated entry
+        if v == dst:
+            return (distances[v], predecessors, len(settled))
+        settled.add(v)
+        dist = distances[v]
+        lo, hi = offsets[v], offsets[v+1]
+        for w, weight in izip(targets[lo:hi], weights[lo:hi]):
+            if w in settled:
+                continue
+            key = dist + weight
+            d = distances.get(w)
+            if d is not None and key >= d:
+                continue
+            if w in bounds:
+                bound = bounds[w]
+            else:
+                bound = bounds[w] = lower_bound(w)
+            if bound is None:
+                continue # w can't reach dst
+            distances[w] = key
+            predecessors[w] = v
+            heappush(frontier, (key + bound, w))
+    return (None, predecessors, len(settled))
+
+
+def _bidirectional_dijkstra(src, dst, forward, backward):
+    """
+    Bidirectional Dijkstra between the vertex-indexes src and dst: a forward
+    search from src over the CSR arrays forward = (offsets, targets, weights),
+    and a backward search from dst over the reversed arrays backward. At each
+    step the side with the smaller frontier key settles a vertex. Whenever an
+    edge reaches a vertex already reached by the other side, the resulting
+    src-dst path is a candidate; the search stops once the two smallest
+    frontier keys add up to at least the best candidate, which is then a
+    shortest path.
+    Returns (distance, meet, forwardPreds, backwardPreds, numSettled), where
+    the path goes from src to meet along forwardPreds (reversed) and from
+    meet to dst along backwardPreds (both dicts, with -1 at the ends), or
+    distance is None if dst is unreachable from src.
+    """
+    if src == dst:
+        return (0, src, {src: -1}, {dst: -1}, 0)
+    dists = ({src: 0}, {dst: 0})
+    preds = ({src: -1}, {dst: -1})
+    settled = (set(), set())
+    frontiers = ([(0, src)], [(0, dst)])
+    graphs = (forward, backward)
+    best, meet = None, -1
+    numSettled = 0
+    while frontiers[0] and frontiers[1]:
+        forwardKey, backwardKey = frontiers[0][0][0], frontiers[1][0][0]
+        if best is not None and forwardKey + backwardKey >= best:
+            break
+        side = 0 if forwardKey <= backwardKey else 1
+        frontier = frontiers[side]
+        dist, v = heappop(frontier)
+        done = settled[side]
+        if v in done:
+            continue # outdated entry
+        done.add(v)
+        numSettled += 1
+        distances, predecessors = dists[side], preds[side]
+        otherDistances = dists[1 - side]
+        offsets, targets, weights = graphs[side]
+        lo, hi = offsets[v], offsets[v+1]
+        for w, weight in izip(targets[lo:hi], weights[lo:hi]):
+            if w in done:
+                continue
+            key = dist + weight
+            d = distances.get(w)
+            if d is None or key < d:
+                distances[w] = key
+                predecessors[w] = v
+                heappush(frontier, (key, w))
+            d = otherDistances.get(w)
+            if d is not None and (best is None or key + d < best):
+                best = key + d
+                meet = w
+    if best is None:
+        return (None, -1, preds[0], preds[1], numSettled)
+    return (best, meet, preds[0], preds[1], numSettled)
+
+
+def _dijkstra_indexed_heap(src, offsets, targets, weights):
+    """
+    Dijkstra's algorithm from the vertex-index src, on the graph with the CSR
+    arrays (offsets, targets, weights).
+    The frontier is a binary heap stored in two lists (keys[i], items[i]) of
+    tentative distances and vertex-indexes, with position[v] the slot of v
+    in the heap: a shorter path to a vertex in the heap decreases its key in
+    place (and sifts it up) instead of pushing a duplicate entry.
+    Returns the lists (distances, predecessors), with -1 for unreached
+    vertices.
+    """
+    n = len(offsets) - 1
+    distances = [-1] * n
+    predecessors = [-1] * n
+    position = [-1] * n # -1 = never reached, -2 = settled
+    keys = [0]
+    items = [src]
+    position[src] = 0
+    while items:
+        # Pop the vertex with the smallest key and settle it
+        v = items[0]
+        dist = keys[0]
+        position[v] = -2
+        distances[v] = dist
+        lastKey = keys.pop()
+        last = items.pop()
+        size = len(items)
+        if size:
+            # Sift the last entry down from the root
+            i = 0
+            c = 1
+            while c < size:
+                ck = keys[c]
+                if c + 1 < size and keys[c+1] < ck:
+                    c += 1
+                    ck = keys[c]
+                if ck >= lastKey:
+                    break
+                w = items[c]
+                keys[i] = ck
+                items[i] = w
+                position[w] = i
+                i = c
+                c = 2*i + 1
+            keys[i] = lastKey
+            items[i] = last
+            position[last] = i
+        # Relax the out-edges of v
+        lo, hi = offsets[v], offsets[v+1]
+        for w, weight in izip(targets[lo:hi], weights[lo:hi]):
+            i = position[w]
+            if i == -2:
+                continue
+            key = dist + weight
+            if i == -1:
+                i = len(items)
+                keys.append(key)
+                items.append(w)
+            elif key >= keys[i]:
+                continue
+            predecessors[w] = v
+            # Sift (w, key) up from the slot i
+            while i:
+                p = (i - 1) >> 1
+                pk = keys[p]
+                if pk <= key:
+                    break
+                u = items[p]
+                keys[i] = pk
+                items[i] = u
+                position[u] = i
+                i = p
+            keys[i] = key
+            items[i] = w
+            position[w] = i
+    return (distances, predecessors)
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import mergesort
 import quicksort
+import externalsort
+import sortstats
 
 def readListFromFile(file):
     """
@@ -11,6 +13,11 @@ def readListFromFile(file):
         return map(int, FILE.read().split())
 
 class CountCompares:
+    """
+    Wrapper which counts comparisons between the wrapped values in a
+    class-wide counter. Superseded by passing a sortstats.SortStats object
+    as the 'stats' argument of the sorts.
+    """
     count = 0
     
     @classmethod
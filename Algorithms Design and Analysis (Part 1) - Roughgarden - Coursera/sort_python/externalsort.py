@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+Functions to sort a file of integers which may not fit into memory, and count
+the number of inversions, using an external (k-way) mergesort.
+"""
+import os
+import tempfile
+from array import array
+from heapq import heapify, heappop, heapreplace
+import mergesort
+
+_ITEM_SIZE = array("l").itemsize
+# Maximum number of runs merged at once (bounded by the open-files limit)
+_MAX_MERGE_WAYS = 128
+
+def iterIntegerBlocksFromFile(file, blockSize=1<<20):
+    """
+    Reads whitespace-separated integers from the specified file, blockSize
+    bytes at a time. Yields them as a sequence of arrays.
+    """
+    with open(file, "r") as FILE:
+        partial = ""
+        while True:
+            block = FILE.read(blockSize)
+            if not block:
+                break
+            tokens = (partial + block).split()
+            # The last token may continue in the next block
+            partial = "" if block[-1].isspace() else tokens.pop()
+            yield array("l", map(int, tokens))
+        if partial:
+            yield array("l", [int(partial)])
+
+
+def _spillRuns(file, runLength, tempDir):
+    """
+    Splits the integers of the file into runs of runLength integers.
+    Sorts each run, and writes it to a temporary binary file.
+    Returns a tuple (inversions within the runs, [(run filename, length)]).
+    """
+    count = 0
+    runs = []
+
+    def spill(run):
+        (runCount, sortedRun) = mergesort._countAndSortBuffer(run)
+        (fd, filename) = tempfile.mkstemp(prefix="run", dir=tempDir)
+        with os.fdopen(fd, "wb") as RUN:
+            sortedRun.tofile(RUN)
+        runs.append((filename, len(sortedRun)))
+        return runCount
+
+    try:
+        run = array("l")
+        for block in iterIntegerBlocksFromFile(file):
+            start = 0
+            while start < len(block):
+                take = min(runLength - len(run), len(block) - start)
+                run.extend(block[start:start+take])
+                start += take
+                if len(run) == runLength:
+                    count += spill(run)
+                    run = array("l")
+        if len(run):
+            count += spill(run)
+    except:
+        _removeRuns(runs)
+        raise
+    return (count, runs)
+
+
+def _removeRuns(runs):
+    for (filename, _) in runs:
+        os.remove(filename)
+
+
+def _iterRun(filename, length, bufferLength):
+    """
+    Yields the integers of a run file, reading bufferLength at a time.
+    """
+    with open(filename, "rb") as RUN:
+        remaining = length
+        while remaining:
+            buf = array("l")
+            buf.fromfile(RUN, min(bufferLength, remaining))
+            remaining -= len(buf)
+            for x in buf:
+                yield x
+
+
+def _fenwickAdd(tree, i, delta):
+    i += 1
+    while i < len(tree):
+        tree[i] += delta
+        i += (i & -i)
+
+
+def _fenwickPrefixSum(tree, i):
+    """
+    Returns the sum of the values at indexes [0, i).
+    """
+    total = 0
+    while i > 0:
+        total += tree[i]
+        i -= (i & -i)
+    return total
+
+
+def _countAndMergeRuns(runs, bufferLength, writeChunk):
+    """
+    Merges the sorted runs using a heap, passing the result to the function
+    writeChunk (if not None) in lists of up to bufferLength integers.
+    Returns the number of inversions between the runs.
+    When an element y of the i-th run is merged, all elements of the runs
+    0..i-1 that are still to be merged are greater than y (equal elements of
+    earlier runs are merged first), so the number of remaining elements in the
+    earlier runs (tracked in a Fenwick tree) is added to the count.
+    """
+    remaining = array("l", [0]) * (len(runs) + 1) # Fenwick tree
+    iterators = []
+    heap = []
+    for (i, (filename, length)) in enumerate(runs):
+        _fenwickAdd(remaining, i, length)
+        it = _iterRun(filename, length, bufferLength)
+        iterators.append(it)
+        heap.append((next(it), i))
+    heapify(heap)
+
+    count = 0
+    out = []
+    while heap:
+        (value, i) = heap[0]
+        count += _fenwickPrefixSum(remaining, i)
+        _fenwickAdd(remaining, i, -1)
+        try:
+            heapreplace(heap, (next(iterators[i]), i))
+        except StopIteration:
+            heappop(heap)
+        if writeChunk is not None:
+            out.append(value)
+            if len(out) == bufferLength:
+                writeChunk(out)
+                out = []
+    if writeChunk is not None and out:
+        writeChunk(out)
+    return count
+
+
+def _countAndMergeRunsToRun(runs, bufferLength, tempDir):
+    """
+    Merges the sorted runs into a new run file.
+    Returns a tuple (inversions between the runs, (run filename, length)).
+    """
+    (fd, filename) = tempfile.mkstemp(prefix="run", dir=tempDir)
+    with os.fdopen(fd, "wb") as RUN:
+        count = _countAndMergeRuns(runs, bufferLength,
+                                   lambda out: array("l", out).tofile(RUN))
+    return (count, (filename, sum(length for (_, length) in runs)))
+
+
+def externalSortAndCountInversions(file, outfile=None, memoryBudget=256<<20,
+                                   tempDir=None):
+    """
+    Sorts the whitespace-separated integers of the specified file without
+    holding all of them in memory, and returns the number of inversions.
+    The integers are read in runs which are sorted (counting the inversions
+    within each run) and spilled to temporary binary files. The runs are then
+    merged using a heap, counting the inversions between runs.
+    outfile      => If specified, the sorted integers are written to this file,
+                    one per line.
+    memoryBudget => Approximate number of bytes of memory to use.
+    tempDir      => Directory for the temporary run files.
+    """
+    # Sorting a run needs 2 buffers of machine-integers
+    runLength = max(1, memoryBudget // (2 * _ITEM_SIZE))
+    (count, runs) = _spillRuns(file, runLength, tempDir)
+    try:
+        # Merge groups of consecutive runs until few enough remain
+        while len(runs) > _MAX_MERGE_WAYS:
+            bufferLength = max(1, memoryBudget //
+                                  ((_MAX_MERGE_WAYS + 1) * _ITEM_SIZE))
+            mergedRuns = []
+            try:
+                for i in xrange(0, len(runs), _MAX_MERGE_WAYS):
+                    group = runs[i:i+_MAX_MERGE_WAYS]
+                    (groupCount, run) = \
+                        _countAndMergeRunsToRun(group, bufferLength, tempDir)
+                    count += groupCount
+                    mergedRuns.append(run)
+            except:
+                _removeRuns(mergedRuns)
+                raise
+            _removeRuns(runs)
+            runs = mergedRuns
+
+        # Split the budget between the read-buffers of the runs and the
+        # output buffer (whose elements take roughly 4x more as strings)
+        bufferLength = max(1, memoryBudget // ((len(runs) + 4) * _ITEM_SIZE))
+        if outfile is None:
+            count += _countAndMergeRuns(runs, bufferLength, None)
+        else:
+            with open(outfile, "w") as OUTPUT:
+                writeChunk = lambda out: \
+                    OUTPUT.write("\n".join(map(str, out)) + "\n")
+                count += _countAndMergeRuns(runs, bufferLength, writeChunk)
+    finally:
+        _removeRuns(runs)
+    return count
@@ -3,6 +3,19 @@
 """
 Functions to sort a list using mergesort, and count number of inversions.
 """
+from array import array
+from bisect import bisect_right
+import ctypes
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Length of the runs that the bottom-up mergesort sorts by insertion before
+# it starts merging.
+_RUN_LENGTH = 64
 
 def _countAndMerge(left, right, _cmp):
     merged = []
@@ -29,21 +42,451 @@ def _countAndMerge(left, right, _cmp):
     return(count, merged)
 
 
-def countInversionsAndSort(inputlist, _cmp=cmp):
+def countInversionsAndSort(inputlist, _cmp=cmp, bottomUp=False,
+                           parallel=False, workers=None, stats=None):
     """
     Given an input list, return a tuple (inversion-count, sortedList)
+    bottomUp => Use the non-recursive single-buffer implementation
+                (see countInversionsAndSortBottomUp).
+    parallel => Sort and count using a pool of processes
+                (see countInversionsAndSortParallel). Implied by workers.
+    workers  => Number of processes for the parallel mode. Defaults to the
+                number of CPUs.
+    stats    => A sortstats.SortStats object to collect the comparisons,
+                recursion-depth and allocations into. Only the recursive
+                pure-Python implementation is instrumented: it is always the
+                one that runs when stats is set (even for inputs which the
+                numpy implementation would handle otherwise), and stats can't
+                be combined with bottomUp or parallel (ValueError).
+    If numpy is available, homogeneous integer inputs are handled by the
+    vectorized implementation (see countInversionsAndSortNumpy).
     """
+    if stats is not None:
+        if parallel or workers or bottomUp:
+            raise ValueError("stats are only collected by the recursive "
+                             "implementation")
+        def countingCmp(a, b):
+            stats.comparisons += 1
+            return _cmp(a, b)
+        return _countInversionsAndSortInstrumented(inputlist, countingCmp,
+                                                   stats, 1)
+    if parallel or workers:
+        if _cmp is not cmp:
+            raise ValueError("Parallel mode does not support a custom _cmp")
+        return countInversionsAndSortParallel(inputlist, workers)
+    if bottomUp:
+        return countInversionsAndSortBottomUp(inputlist, _cmp)
+    if _cmp is cmp and np is not None:
+        arr = _asIntegerArray(inputlist)
+        if arr is not None:
+            (count, sortedArr) = countInversionsAndSortNumpy(arr)
+            if not isinstance(inputlist, np.ndarray):
+                sortedArr = sortedArr.tolist()
+            return (count, sortedArr)
+    return _countInversionsAndSort(inputlist, _cmp)
+
+
+def _countInversionsAndSort(inputlist, _cmp):
     inputLength = len(inputlist)
     if(inputLength <= 1): return (0, inputlist)
 
     mid = inputLength // 2
 
     (lInversions, lSorted) = \
-        countInversionsAndSort(inputlist[:mid], _cmp)
+        _countInversionsAndSort(inputlist[:mid], _cmp)
     (rInversions, rSorted) = \
-        countInversionsAndSort(inputlist[mid:], _cmp)
+        _countInversionsAndSort(inputlist[mid:], _cmp)
+    (splitInversions, fullSorted) = \
+        _countAndMerge(lSorted, rSorted, _cmp)
+
+    return (splitInversions + lInversions + rInversions, fullSorted)
+
+
+def _countInversionsAndSortInstrumented(inputlist, _cmp, stats, depth):
+    """
+    The recursion of _countInversionsAndSort(), collecting statistics into
+    stats. It merges with the same _countAndMerge(), given a _cmp which
+    counts the comparisons. Kept separate, so the default recursion pays
+    nothing for it.
+    """
+    stats.enter(depth)
+    inputLength = len(inputlist)
+    if(inputLength <= 1): return (0, inputlist)
+
+    mid = inputLength // 2
+
+    stats.allocations += 3 # two slices and the merged list
+    (lInversions, lSorted) = _countInversionsAndSortInstrumented(
+        inputlist[:mid], _cmp, stats, depth+1)
+    (rInversions, rSorted) = _countInversionsAndSortInstrumented(
+        inputlist[mid:], _cmp, stats, depth+1)
     (splitInversions, fullSorted) = \
         _countAndMerge(lSorted, rSorted, _cmp)
 
     return (splitInversions + lInversions + rInversions, fullSorted)
 
+
+def _makeBuffer(inputlist):
+    """
+    Copies inputlist into a compact array of machine-integers if possible,
+    or into a plain list otherwise.
+    """
+    try:
+        return array("l", inputlist)
+    except (TypeError, OverflowError):
+        return list(inputlist)
+
+
+def _countAndSortRuns(buf, runLength):
+    """
+    Sorts each run buf[lo:lo+runLength] in-place by binary insertion.
+    Returns the total number of inversions within the runs.
+    """
+    count = 0
+    n = len(buf)
+    for lo in xrange(0, n, runLength):
+        hi = min(lo + runLength, n)
+        run = []
+        for x in buf[lo:hi]:
+            pos = bisect_right(run, x)
+            count += len(run) - pos # elements of the run greater than x
+            run.insert(pos, x)
+        buf[lo:hi] = array(buf.typecode, run) if isinstance(buf, array) \
+                     else run
+    return count
+
+
+def _countAndSortRunsCmp(buf, runLength, _cmp):
+    """
+    Same as _countAndSortRuns(), but using the comparison-function _cmp.
+    """
+    count = 0
+    n = len(buf)
+    for lo in xrange(0, n, runLength):
+        hi = min(lo + runLength, n)
+        for i in xrange(lo + 1, hi):
+            x = buf[i]
+            j = i
+            while j > lo and _cmp(buf[j-1], x) > 0:
+                buf[j] = buf[j-1]
+                j -= 1
+            buf[j] = x
+            count += i - j
+    return count
+
+
+def _countAndMergeRuns(src, dst, lo, mid, hi):
+    """
+    Merges the sorted runs src[lo:mid] and src[mid:hi] into dst[lo:hi].
+    Returns the number of inversions between the two runs.
+    """
+    return _countAndMergeRanges(src, dst, lo, mid, mid, hi, lo)
+
+
+def _countAndMergeRanges(src, dst, i, iEnd, j, jEnd, k):
+    """
+    Merges the sorted ranges src[i:iEnd] and src[j:jEnd] into dst, starting
+    at dst[k]. Returns the number of inversions between the two ranges.
+    src and dst may be arrays, lists or ctypes arrays.
+    """
+    if i == iEnd or j == jEnd or src[iEnd-1] <= src[j]:
+        # Ranges are already in order
+        dst[k:k+iEnd-i] = src[i:iEnd]
+        k += iEnd - i
+        dst[k:k+jEnd-j] = src[j:jEnd]
+        return 0
+    count = 0
+    a, b = src[i], src[j]
+    while True:
+        if a <= b:
+            dst[k] = a
+            k += 1
+            i += 1
+            if i == iEnd:
+                dst[k:k+jEnd-j] = src[j:jEnd]
+                break
+            a = src[i]
+        else:
+            dst[k] = b
+            k += 1
+            j += 1
+            count += iEnd - i
+            if j == jEnd:
+                dst[k:k+iEnd-i] = src[i:iEnd]
+                break
+            b = src[j]
+    return count
+
+
+def _countAndMergeRunsCmp(src, dst, lo, mid, hi, _cmp):
+    """
+    Same as _countAndMergeRuns(), but using the comparison-function _cmp.
+    """
+    count = 0
+    (i, j, k) = (lo, mid, lo)
+    while i < mid and j < hi:
+        if _cmp(src[i], src[j]) <= 0:
+            dst[k] = src[i]
+            i += 1
+        else:
+            dst[k] = src[j]
+            j += 1
+            count += mid - i
+        k += 1
+    if i < mid:
+        dst[k:hi] = src[i:mid]
+    else:
+        dst[k:hi] = src[j:hi]
+    return count
+
+
+def countInversionsAndSortBottomUp(inputlist, _cmp=cmp):
+    """
+    Given an input list, return a tuple (inversion-count, sortedList).
+    Non-recursive (bottom-up) mergesort which ping-pongs between the input
+    buffer and a single auxiliary buffer of the same size, instead of
+    allocating new lists at every level.
+    Integer inputs are held in compact arrays, and the comparison-function is
+    only called if a custom _cmp is specified.
+    """
+    (count, src) = _countAndSortBuffer(_makeBuffer(inputlist), _cmp)
+    return (count, src.tolist() if isinstance(src, array) else src)
+
+
+def _countAndSortBuffer(src, _cmp=cmp, dst=None):
+    """
+    Used internally by countInversionsAndSortBottomUp().
+    Sorts the buffer src (an array, list or ctypes array), which may be
+    reused as the auxiliary buffer. dst is the auxiliary buffer, of the same
+    length (a copy of src by default). Returns a tuple
+    (inversion-count, sortedBuffer), where sortedBuffer is src or dst.
+    """
+    n = len(src)
+    if n <= 1: return (0, src)
+
+    if _cmp is cmp:
+        count = _countAndSortRuns(src, _RUN_LENGTH)
+        merge = _countAndMergeRuns
+    else:
+        count = _countAndSortRunsCmp(src, _RUN_LENGTH, _cmp)
+        merge = lambda src, dst, lo, mid, hi: \
+                    _countAndMergeRunsCmp(src, dst, lo, mid, hi, _cmp)
+
+    if dst is None:
+        dst = src[:]
+    width = _RUN_LENGTH
+    while width < n:
+        for lo in xrange(0, n, 2*width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2*width, n)
+            if mid == hi:
+                # Trailing run without a partner
+                dst[lo:hi] = src[lo:hi]
+            else:
+                count += merge(src, dst, lo, mid, hi)
+        (src, dst) = (dst, src)
+        width *= 2
+
+    return (count, src)
+
+
+def _asIntegerArray(inputlist):
+    """
+    Returns inputlist as a numpy integer array, or None if it doesn't hold
+    integers only.
+    """
+    if isinstance(inputlist, np.ndarray):
+        arr = inputlist
+    else:
+        try:
+            arr = np.asarray(inputlist)
+        except (ValueError, OverflowError):
+            return None
+    if arr.ndim != 1 or arr.dtype.kind not in "iu":
+        return None
+    return arr
+
+
+def countInversionsAndSortNumpy(inputlist):
+    """
+    Given an input list or numpy array of integers, return a tuple
+    (inversion-count, sortedArray). Requires numpy.
+    The values are first replaced by their ranks 0..n-1 (equal values are
+    ranked in order of position, so they never count as inversions).
+    The ranks are then processed one bit at a time, from the most-significant
+    bit down: ranks sharing the higher bits form a group, and each rank with
+    the current bit cleared is inverted with every rank in its group that has
+    the bit set and precedes it. Each bit-level is a handful of vectorized
+    O(n) passes, for O(n log n) overall.
+    """
+    arr = np.asarray(inputlist)
+    n = len(arr)
+    order = np.argsort(arr, kind="mergesort")
+    if n <= 1:
+        return (0, arr[order])
+
+    # Ranks and positions fit into 32 bits for all but huge inputs, which
+    # halves the memory traffic of every pass.
+    dtype = np.int32 if n < 2**31 else np.int64
+    ranks = np.empty(n, dtype=dtype)
+    ranks[order] = np.arange(n, dtype=dtype)
+    positions = np.arange(n, dtype=dtype)
+
+    count = 0
+    bit = int(n - 1).bit_length() - 1
+    while bit >= 0:
+        isOne = (ranks >> bit) & 1
+        # Ranks with the same higher bits are stored contiguously, and since
+        # the ranks are a permutation of 0..n-1 the group starts at index
+        # (higher bits << (bit+1)).
+        groupStart = (ranks >> (bit + 1)) << (bit + 1)
+        onesBefore = np.cumsum(isOne, dtype=dtype) - isOne
+        onesBefore -= onesBefore[groupStart]
+        isZero = (isOne == 0)
+        count += int(onesBefore[isZero].sum(dtype=np.int64))
+        # Stable partition of each group: zeros, then ones
+        zerosInGroup = np.minimum(1 << bit, n - groupStart)
+        newPositions = np.where(isZero, positions - onesBefore,
+                                groupStart + zerosInGroup + onesBefore)
+        reordered = np.empty_like(ranks)
+        reordered[newPositions] = ranks
+        ranks = reordered
+        bit -= 1
+
+    return (count, arr[order])
+
+
+# Shared buffers of the parallel mergesort, as seen by the worker processes.
+_sharedBuffers = None
+
+def _initParallelWorker(buffers):
+    global _sharedBuffers
+    _sharedBuffers = buffers
+
+
+def _writeShared(raw, lo, buf):
+    """
+    Copies the array buf into raw[lo:lo+len(buf)].
+    """
+    if len(buf):
+        ctypes.memmove(ctypes.addressof(raw) + lo * buf.itemsize,
+                       buf.buffer_info()[0], len(buf) * buf.itemsize)
+
+
+def _sharedView(raw, lo, hi):
+    """
+    Returns raw[lo:hi] (a shared ctypes array of longs) as a ctypes array
+    over the same memory, without copying it.
+    """
+    return (ctypes.c_long * (hi - lo)).from_buffer(
+        raw, lo * ctypes.sizeof(ctypes.c_long))
+
+
+def _countAndSortSharedChunk(bounds):
+    """
+    Pool task: sorts the chunk [lo,hi) of the first shared buffer in-place,
+    with the bottom-up mergesort, using the same chunk of the second shared
+    buffer as its auxiliary buffer.
+    Returns the number of inversions within the chunk.
+    """
+    (lo, hi) = bounds
+    chunk = _sharedView(_sharedBuffers[0], lo, hi)
+    aux = _sharedView(_sharedBuffers[1], lo, hi)
+    (count, sortedChunk) = _countAndSortBuffer(chunk, cmp, aux)
+    if sortedChunk is not chunk:
+        ctypes.memmove(chunk, sortedChunk, ctypes.sizeof(chunk))
+    return count
+
+
+def _countAndMergeSharedSegment(task):
+    """
+    Pool task: merges one segment of the sorted runs src[lo:mid] and
+    src[mid:hi], namely src[lo+i0:lo+i1] and src[mid+j0:mid+j1], into dst
+    (starting at lo+i0+j0), directly between the shared buffers.
+    Returns the number of inversions that the right-run elements of the
+    segment have with the entire left run.
+    """
+    (level, lo, mid, hi, i0, i1, j0, j1) = task
+    src = _sharedBuffers[level % 2]
+    dst = _sharedBuffers[(level + 1) % 2]
+    # Right elements are also inverted with the left elements beyond i1
+    count = (mid - lo - i1) * (j1 - j0)
+    count += _countAndMergeRanges(src, dst, lo + i0, lo + i1, mid + j0,
+                                  mid + j1, lo + i0 + j0)
+    return count
+
+
+def _splitMerge(src, lo, mid, hi, k):
+    """
+    Returns the number of elements of the left run src[lo:mid] among the first
+    k elements of the stable merge of src[lo:mid] and src[mid:hi].
+    """
+    (iLo, iHi) = (max(0, k - (hi - mid)), min(k, mid - lo))
+    while iLo < iHi:
+        i = (iLo + iHi) // 2
+        if src[lo + i] <= src[mid + k - i - 1]:
+            iLo = i + 1
+        else:
+            iHi = i
+    return iLo
+
+
+def countInversionsAndSortParallel(inputlist, workers=None):
+    """
+    Given an input list of integers, return a tuple
+    (inversion-count, sortedList), using a pool of worker processes.
+    The input is copied into a buffer in shared memory and split into one
+    chunk per worker, which the workers sort (counting the inversions within
+    each chunk). The sorted chunks are then merged pairwise, level by level;
+    each merge is split into equal-sized segments along the merge-path so
+    that all workers stay busy, even at the top levels.
+    workers => Number of processes. Defaults to the number of CPUs.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    try:
+        buf = array("l", inputlist)
+    except (TypeError, OverflowError):
+        raise ValueError("Parallel mode requires machine-sized integers")
+    n = len(buf)
+    if workers <= 1 or n < workers * _RUN_LENGTH:
+        return countInversionsAndSortBottomUp(buf)
+
+    buffers = (RawArray("l", n), RawArray("l", n))
+    _writeShared(buffers[0], 0, buf)
+    del buf
+
+    chunks = [(n * c // workers, n * (c+1) // workers) for c in xrange(workers)]
+    pool = multiprocessing.Pool(workers, _initParallelWorker, (buffers,))
+    try:
+        count = sum(pool.map(_countAndSortSharedChunk, chunks))
+
+        level = 0
+        while len(chunks) > 1:
+            src = buffers[level % 2]
+            tasks = []
+            nextChunks = []
+            for c in xrange(0, len(chunks), 2):
+                if c + 1 == len(chunks):
+                    # Trailing chunk without a partner: copied as a segment
+                    (lo, hi) = chunks[c]
+                    tasks.append((level, lo, hi, hi, 0, hi - lo, 0, 0))
+                    nextChunks.append((lo, hi))
+                    continue
+                (lo, mid), (_, hi) = chunks[c], chunks[c+1]
+                segments = -(-2 * workers // len(chunks)) # ceil
+                (i0, j0) = (0, 0)
+                for s in xrange(1, segments + 1):
+                    k = (hi - lo) * s // segments
+                    i1 = _splitMerge(src, lo, mid, hi, k)
+                    j1 = k - i1
+                    tasks.append((level, lo, mid, hi, i0, i1, j0, j1))
+                    (i0, j0) = (i1, j1)
+                nextChunks.append((lo, hi))
+            count += sum(pool.map(_countAndMergeSharedSegment, tasks))
+            chunks = nextChunks
+            level += 1
+    finally:
+        pool.close()
+        pool.join()
+
+    return (count, buffers[level % 2][:])
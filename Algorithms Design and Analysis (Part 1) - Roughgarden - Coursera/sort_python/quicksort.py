@@ -1,5 +1,13 @@
 # -*- coding: utf-8 -*-
 import random
+import math
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Ranges up to this length are sorted by insertion-sort in the introsort mode
+_INSERTION_SORT_CUTOFF = 16
 
 def _median3(arr, i, j, k):
     a, b, c = arr[i], arr[j], arr[k]
@@ -66,9 +74,272 @@ def _qsort(arr, start, end):
     _qsort(arr, pivotIdx+1, end)
 
 
-def quicksort(arr):
+def _qsortInstrumented(arr, start, end, stats, depth):
+    """
+    The recursion of _qsort(), collecting statistics into stats. It
+    partitions with the same _partition(), and derives the counts from the
+    position of the pivot. Kept separate, so the default recursion pays
+    nothing for it.
+    """
+    stats.enter(depth)
+    length = (end - start)
+    if(length <= 1): return
+
+    pivotIdx = _partition(arr, start, end)
+    # _partition() compares each element but the pivot once, and swaps the
+    # pivot in and out plus each element it moves to the right side
+    stats.comparisons += length - 1
+    stats.swaps += end - pivotIdx + 1
+    stats.recordPartition(pivotIdx - start, end - pivotIdx - 1)
+
+    _qsortInstrumented(arr, start, pivotIdx, stats, depth+1)
+    _qsortInstrumented(arr, pivotIdx+1, end, stats, depth+1)
+
+
+def _randomPivot(arr, start, end):
+    return random.randrange(start, end)
+
+
+def _median3Pivot(arr, start, end):
+    return _median3(arr, start, (start + end - 1) // 2, end - 1)
+
+
+def _nintherPivot(arr, start, end):
+    # Tukey's ninther: median of the medians of three groups of three
+    length = end - start
+    if length < 9:
+        return _median3Pivot(arr, start, end)
+    step = length // 8
+    mid = (start + end - 1) // 2
+    last = end - 1
+    return _median3(arr, _median3(arr, start, start + step, start + 2*step),
+                         _median3(arr, mid - step, mid, mid + step),
+                         _median3(arr, last - 2*step, last - step, last))
+
+
+# Pivot strategies for the introsort mode.
+# Each returns the index of the pivot within arr[start:end].
+_PIVOT_STRATEGIES = {
+    "random":  _randomPivot,
+    "median3": _median3Pivot,
+    "ninther": _nintherPivot,
+}
+
+
+def _partition3(arr, start, end, pivotIdx):
+    """
+    Dutch-national-flag partitioning of arr[start:end] around arr[pivotIdx].
+    Returns (lt, gt) such that arr[start:lt] < pivot, arr[lt:gt] == pivot
+    and arr[gt:end] > pivot.
+    """
+    pivot = arr[pivotIdx]
+    (lt, i, gt) = (start, start, end)
+    while i < gt:
+        x = arr[i]
+        if x < pivot:
+            arr[i] = arr[lt]
+            arr[lt] = x
+            lt += 1
+            i += 1
+        elif pivot < x:
+            gt -= 1
+            arr[i] = arr[gt]
+            arr[gt] = x
+        else:
+            i += 1
+    return (lt, gt)
+
+
+def _insertionSort(arr, start, end):
+    for i in xrange(start + 1, end):
+        x = arr[i]
+        j = i
+        while j > start and x < arr[j-1]:
+            arr[j] = arr[j-1]
+            j -= 1
+        arr[j] = x
+
+
+def _heapsort(arr, start, end):
+    length = end - start
+
+    def siftDown(root, size):
+        x = arr[start + root]
+        child = 2*root + 1
+        while child < size:
+            if child + 1 < size and arr[start + child] < arr[start + child + 1]:
+                child += 1
+            if not (x < arr[start + child]):
+                break
+            arr[start + root] = arr[start + child]
+            root = child
+            child = 2*root + 1
+        arr[start + root] = x
+
+    for root in xrange(length // 2 - 1, -1, -1):
+        siftDown(root, length)
+    for last in xrange(length - 1, 0, -1):
+        arr[start], arr[start + last] = arr[start + last], arr[start]
+        siftDown(0, last)
+
+
+def _introsort(arr, start, end, pickPivot):
+    """
+    Sorts arr[start:end] using quicksort with an explicit stack.
+    The smaller side of every partition is processed first (the larger side
+    is pushed on the stack), so the stack holds at most log2(n) ranges.
+    Ranges which exceed a partitioning depth of 2*log2(n) are heapsorted,
+    which bounds the running time to O(n log n).
+    """
+    length = end - start
+    if length <= 1: return
+    maxDepth = 2 * int(math.log(length, 2))
+    stack = [(start, end, 0)]
+    while stack:
+        (start, end, depth) = stack.pop()
+        while end - start > _INSERTION_SORT_CUTOFF:
+            if depth > maxDepth:
+                _heapsort(arr, start, end)
+                break
+            (lt, gt) = _partition3(arr, start, end, pickPivot(arr, start, end))
+            depth += 1
+            if lt - start < end - gt:
+                stack.append((gt, end, depth))
+                end = lt
+            else:
+                stack.append((start, lt, depth))
+                start = gt
+        else:
+            _insertionSort(arr, start, end)
+
+
+def quicksort(arr, introsort=False, pivot="ninther", stats=None):
     """
     Sort list 'arr' using quicksort (in-place).
+    introsort => Use the non-recursive introsort mode, with 3-way partitioning,
+                 insertion-sort for small ranges and a heapsort fallback.
+                 Not limited by the recursion-depth, and handles inputs with
+                 many duplicates well.
+    pivot     => Pivot strategy for the introsort mode: "random", "median3",
+                 "ninther", or a function (arr, start, end) which returns the
+                 index of the pivot within arr[start:end].
+    stats     => A sortstats.SortStats object to collect the comparisons,
+                 swaps, recursion-depth and partition-balance into. Only the
+                 (recursive) default mode is instrumented: stats can't be
+                 combined with introsort (ValueError).
     """
+    if stats is not None:
+        if introsort:
+            raise ValueError("stats are only collected by the default mode")
+        return _qsortInstrumented(arr, 0, len(arr), stats, 1)
+    if introsort:
+        if isinstance(pivot, basestring):
+            if pivot not in _PIVOT_STRATEGIES:
+                raise ValueError("Unknown pivot strategy {!r} (expected one "
+                                 "of {})".format(pivot,
+                                 ", ".join(sorted(_PIVOT_STRATEGIES))))
+            pickPivot = _PIVOT_STRATEGIES[pivot]
+        else:
+            pickPivot = pivot
+        return _introsort(arr, 0, len(arr), pickPivot)
     return _qsort(arr, 0, len(arr))
 
+
+def _medianOfMediansPivot(arr, start, end):
+    """
+    Returns the index of the median-of-medians (of groups of 5) of
+    arr[start:end], which is guaranteed to lie between the 30th and 70th
+    percentile of the range. Reorders the range.
+    """
+    if end - start <= 5:
+        _insertionSort(arr, start, end)
+        return (start + end - 1) // 2
+    # Move the median of each group of 5 to the front of the range
+    numMedians = 0
+    for group in xrange(start, end, 5):
+        groupEnd = min(group + 5, end)
+        _insertionSort(arr, group, groupEnd)
+        m = (group + groupEnd - 1) // 2
+        i = start + numMedians
+        arr[i], arr[m] = arr[m], arr[i]
+        numMedians += 1
+    mid = start + (numMedians - 1) // 2
+    _select(arr, start, start + numMedians, mid)
+    return mid
+
+
+def _select(arr, start, end, k):
+    """
+    Reorders arr[start:end] so that arr[k] is the element that would be at
+    that position if the range were sorted, with no larger elements before
+    it and no smaller elements after it. Returns arr[k].
+    Uses quickselect with random pivots, falling back to median-of-medians
+    pivots once the partitioning work exceeds 4x the length of the range
+    (about the expected work of quickselect), so the running time is linear
+    in the worst-case.
+    """
+    randomBudget = 4 * (end - start)
+    while end - start > _INSERTION_SORT_CUTOFF:
+        if randomBudget > 0:
+            randomBudget -= end - start
+            pivotIdx = random.randrange(start, end)
+        else:
+            pivotIdx = _medianOfMediansPivot(arr, start, end)
+        (lt, gt) = _partition3(arr, start, end, pivotIdx)
+        if k < lt:
+            end = lt
+        elif k >= gt:
+            start = gt
+        else:
+            return arr[k]
+    _insertionSort(arr, start, end)
+    return arr[k]
+
+
+def select(arr, k):
+    """
+    Returns the k-th smallest element of list 'arr' (counting from 0, so
+    select(arr, k) == sorted(arr)[k]) in expected and worst-case linear time.
+    arr is reordered in-place so that arr[k] holds the result, with no larger
+    elements before it and no smaller elements after it.
+    Numpy arrays are handled by numpy.partition.
+    """
+    n = len(arr)
+    if k < 0: k += n
+    if not 0 <= k < n:
+        raise IndexError("select index out of range")
+    if np is not None and isinstance(arr, np.ndarray):
+        arr.partition(k)
+        return arr[k]
+    return _select(arr, 0, n, k)
+
+
+def nsmallest(arr, k):
+    """
+    Returns a sorted list of the k smallest elements of list 'arr'.
+    arr is reordered in-place so that these are arr[:k].
+    Numpy arrays are handled by numpy.partition, and return an array.
+    """
+    n = len(arr)
+    k = max(0, min(k, n))
+    if k == 0:
+        return arr[:0]
+    if np is not None and isinstance(arr, np.ndarray):
+        if k < n:
+            arr.partition(k - 1)
+        arr[:k].sort()
+        return arr[:k].copy()
+    if k < n:
+        _select(arr, 0, n, k - 1)
+    _introsort(arr, 0, k, _nintherPivot)
+    return arr[:k]
+
+
+def median(arr):
+    """
+    Returns the median of list 'arr', i.e. the ((n+1)/2)-th smallest element
+    (the lower median if the length n is even). Reorders arr in-place.
+    """
+    if len(arr) == 0:
+        raise ValueError("median of an empty list")
+    return select(arr, (len(arr) - 1) // 2)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per-run statistics collected by the instrumented sorts.
+"""
+
+class SortStats:
+    """
+    Counters for a single sorting run. Pass an instance as the 'stats'
+    argument of mergesort.countInversionsAndSort() or quicksort.quicksort().
+    Every run should use its own instance, so concurrent runs don't interfere.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.comparisons = 0 # element comparisons
+        self.swaps = 0       # element swaps (quicksort)
+        self.calls = 0       # recursive calls
+        self.maxDepth = 0    # deepest recursion level reached
+        self.allocations = 0 # lists allocated (mergesort)
+        self.partitions = 0  # partitioning steps (quicksort)
+        self._balanceSum = 0.0
+
+    def enter(self, depth):
+        """
+        Records a recursive call at the specified depth.
+        """
+        self.calls += 1
+        if depth > self.maxDepth:
+            self.maxDepth = depth
+
+    def recordPartition(self, leftSize, rightSize):
+        """
+        Records the sizes of the two sides of a partitioning step.
+        """
+        self.partitions += 1
+        if leftSize or rightSize:
+            self._balanceSum += float(min(leftSize, rightSize)) / \
+                                max(leftSize, rightSize)
+
+    @property
+    def partitionBalance(self):
+        """
+        Average ratio of the smaller to the larger side of the partitions:
+        1.0 for perfect splits, 0.0 for completely lopsided ones.
+        """
+        if self.partitions == 0:
+            return None
+        return self._balanceSum / self.partitions
+
+    def __repr__(self):
+        return ("SortStats(comparisons={}, swaps={}, calls={}, maxDepth={}, "
+                "allocations={}, partitions={}, partitionBalance={})").format(
+                self.comparisons, self.swaps, self.calls, self.maxDepth,
+                self.allocations, self.partitions, self.partitionBalance)
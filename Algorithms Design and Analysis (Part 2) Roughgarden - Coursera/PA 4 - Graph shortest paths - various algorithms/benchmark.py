@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the running time of Johnson's algorithm with the Dijkstra searches
+run on a binary heap, and on the bucket-queue chosen from the (reweighted)
+edge-costs, on random graphs with negative costs but no negative cycle, or on
+the specified graph file.
+Usage: python benchmark.py [filename]
+"""
+import sys
+import time
+import random
+from graph_shortest_paths import Graph
+
+def random_graph(n, m, max_cost, rng):
+    """
+    Returns a graph with n vertices and m random edges, with costs in
+    0..max_cost shifted by random vertex-potentials (so some are negative,
+    but no cycle is).
+    """
+    g = Graph()
+    potentials = [rng.randint(0, max_cost) for i in xrange(n+1)]
+    for v in xrange(1, n+1):
+        g.add_edge(v, v % n + 1, max_cost + potentials[v % n + 1] - \
+                                 potentials[v])
+    for i in xrange(m - n):
+        u, v = rng.randint(1, n), rng.randint(1, n)
+        g.add_edge(u, v, rng.randint(0, max_cost) + potentials[v] - \
+                         potentials[u])
+    return g
+
+
+def benchmark(name, g):
+    times = {}
+    for queue in ("heap", None):
+        start = time.time()
+        distances = g.johnson_shortest_distances(queue)
+        times[queue] = time.time() - start
+        if queue == "heap":
+            expected = distances
+        assert distances == expected
+    print "{:<36} johnson: heap {:7.2f}s   bucket-queue {:7.2f}s   " \
+          "speedup {:.1f}x".format(name, times["heap"], times[None],
+                                   times["heap"] / times[None])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        g = Graph(sys.argv[1])
+        benchmark("{} {}".format(sys.argv[1], g), g)
+    else:
+        rng = random.Random(1)
+        for (n, m, max_cost) in ((200, 5000, 10), (200, 5000, 1000),
+                                 (500, 20000, 50)):
+            g = random_graph(n, m, max_cost, rng)
+            benchmark("{} costs<={}".format(g, max_cost), g)
@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "..", "bucketqueue"))
+from bucketqueue import WeightStats, dial_shortest_distances, \
+                        radix_shortest_distances
 from collections import namedtuple
 from heapq import heappush, heappop
+import copy
 
 #%%
 class Graph:
@@ -17,6 +24,7 @@ class Graph:
         self._out_neighbors = list()
         self._edges         = list()
         self._vertices      = set()
+        self.weight_stats   = WeightStats() # of the costs of all the edges
         if(filename):
             self.read_from(filename)
     
@@ -54,6 +62,7 @@ class Graph:
         
     def add_edge(self, src, dest, cost):
         self._edges.append(Graph.Edge(src,dest,cost))
+        self.weight_stats.add(cost)
         self._vertices.add(src)
         self._vertices.add(dest)
         if src >= len(self._out_neighbors):
@@ -120,54 +129,81 @@ class Graph:
         
         return distances
     
-    def johnson_shortest_distances(self):
+    def johnson_shortest_distances(self, queue=None):
         self.validate()
         orig_num_vertices = self.num_vertices()
         
-        # Add a temporary vertex
-        temp_vertex = orig_num_vertices + 1
-        self._vertices.add(temp_vertex)
-        for v in xrange(1,orig_num_vertices+1):
-            self.add_edge(temp_vertex, v, 0)
-        vertex_weights = self.bellman_ford_shortest_distances_from(temp_vertex)
-        # Remove the temporary vertex
-        self._vertices.remove(temp_vertex)
-        self._edges = [edge for edge in self._edges \
-                       if edge.src != temp_vertex and edge.dest != temp_vertex]
-        self._out_neighbors.pop()
-        
-        # Adjust edge-weights to be positive
-        self._out_neighbors = \
-            [None] + [[] for i in xrange(1,orig_num_vertices+1)]
-        for i,(src,dest,cost) in enumerate(self._edges):
-            cost += (vertex_weights[src] - vertex_weights[dest])
-            self._edges[i] = Graph.Edge(src,dest,cost)
-            self._out_neighbors[src].append(Graph.Neighbor(dest,cost))
-        
-        # Compute all pairwise distances
-        distances = self.dijkstra_shortest_distances_all_pairs()
-        for src in xrange(1,self.num_vertices()+1):
-            for dest in xrange(1,self.num_vertices()+1):
-                if distances[src][dest] is not None:
-                    distances[src][dest] += (vertex_weights[dest] - vertex_weights[src])
-        
-        # Revert edge-weights to original
-        self._out_neighbors = \
-            [None] + [[] for i in xrange(1,orig_num_vertices+1)]
-        for i,(src,dest,cost) in enumerate(self._edges):
-            cost += (vertex_weights[dest] - vertex_weights[src])
-            self._edges[i] = Graph.Edge(src,dest,cost)
-            self._out_neighbors[src].append(Graph.Neighbor(dest,cost))
+        origWeightStats = copy.copy(self.weight_stats)
+        try:
+            # Add a temporary vertex
+            temp_vertex = orig_num_vertices + 1
+            self._vertices.add(temp_vertex)
+            for v in xrange(1,orig_num_vertices+1):
+                self.add_edge(temp_vertex, v, 0)
+            try:
+                vertex_weights = self.bellman_ford_shortest_distances_from(temp_vertex)
+            finally:
+                # Remove the temporary vertex (even upon a negative-cycle)
+                self._vertices.remove(temp_vertex)
+                self._edges = [edge for edge in self._edges \
+                               if edge.src != temp_vertex and edge.dest != temp_vertex]
+                self._out_neighbors.pop()
+            
+            # Adjust edge-weights to be positive
+            self._out_neighbors = \
+                [None] + [[] for i in xrange(1,orig_num_vertices+1)]
+            for i,(src,dest,cost) in enumerate(self._edges):
+                cost += (vertex_weights[src] - vertex_weights[dest])
+                self._edges[i] = Graph.Edge(src,dest,cost)
+                self._out_neighbors[src].append(Graph.Neighbor(dest,cost))
+            self.weight_stats = WeightStats(edge.cost for edge in self._edges)
+            
+            # Compute all pairwise distances
+            distances = self.dijkstra_shortest_distances_all_pairs(queue)
+            for src in xrange(1,self.num_vertices()+1):
+                for dest in xrange(1,self.num_vertices()+1):
+                    if distances[src][dest] is not None:
+                        distances[src][dest] += (vertex_weights[dest] - vertex_weights[src])
+            
+            # Revert edge-weights to original
+            self._out_neighbors = \
+                [None] + [[] for i in xrange(1,orig_num_vertices+1)]
+            for i,(src,dest,cost) in enumerate(self._edges):
+                cost += (vertex_weights[dest] - vertex_weights[src])
+                self._edges[i] = Graph.Edge(src,dest,cost)
+                self._out_neighbors[src].append(Graph.Neighbor(dest,cost))
+        finally:
+            # The statistics of the temporary or adjusted edge-weights must
+            # not outlive this call
+            self.weight_stats = origWeightStats
             
         return distances
     
-    def dijkstra_shortest_distances_all_pairs(self):
+    def dijkstra_shortest_distances_all_pairs(self, queue=None):
         distances = [None]
         for i in xrange(1,self.num_vertices()+1):
-            distances.append(self.dijkstra_shortest_distances_from(i))
+            distances.append(self.dijkstra_shortest_distances_from(i, queue))
         return distances
         
-    def dijkstra_shortest_distances_from(self, src):
+    def dijkstra_shortest_distances_from(self, src, queue=None):
+        """
+        queue => Priority-queue of the frontier: "heap" (a binary heap),
+                 "dial" or "radix" (monotone bucket-queues, for non-negative
+                 integer costs, see the bucketqueue module). By default it
+                 is chosen from the statistics of the edge-costs.
+        """
+        if queue is None:
+            queue = self.weight_stats.queue()
+        if queue in ("dial", "radix"):
+            if queue == "dial":
+                found = dial_shortest_distances(self._out_neighbors, src,
+                                                self.weight_stats.max_weight)
+            else:
+                found = radix_shortest_distances(self._out_neighbors, src)
+            distances = [None]*(self.num_vertices()+1)
+            for v, dist in found.iteritems():
+                distances[v] = dist
+            return distances
         FrontierEntry = namedtuple("FrontierEntry", ("distance","vertex"))
         frontier = []
         explored = set()
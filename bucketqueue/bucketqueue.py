@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Monotone priority-queues for Dijkstra's algorithm on graphs with non-negative
+integer edge-weights, which avoid the log-factor of a binary heap:
+    - Dial's buckets: a circular array of max_weight+1 buckets of vertices,
+      one per tentative distance (modulo max_weight+1), scanned in order.
+    - RadixHeap: buckets of keys by the highest bit in which they differ from
+      the last key popped, so that each key is moved at most once per bit.
+    - WeightStats: statistics of the edge-weights of a graph, gathered as its
+      edges are added, to choose between the two (or a binary heap).
+The graphs are given as adjacencies: a mapping (dict or list) of each vertex
+to an iterable of (neighbor, weight) pairs.
+"""
+
+# Dial's buckets are used for weights up to that
+DIAL_MAX_WEIGHT = 1 << 16
+
+class WeightStats:
+    def __init__(self, weights=()):
+        """
+        Initialize the statistics of the specified edge-weights.
+        """
+        self.num_weights = 0
+        self.min_weight = None
+        self.max_weight = None
+        self.integral = True # all the weights are integers
+        self.update(weights)
+
+    def add(self, weight):
+        """
+        Adds the weight of a new edge to the statistics.
+        """
+        self.num_weights += 1
+        if self.min_weight is None or weight < self.min_weight:
+            self.min_weight = weight
+        if self.max_weight is None or weight > self.max_weight:
+            self.max_weight = weight
+        if self.integral and not isinstance(weight, (int, long)):
+            self.integral = False
+
+    def update(self, weights):
+        for weight in weights:
+            self.add(weight)
+
+    def queue(self):
+        """
+        Returns the kind of priority-queue suited to the weights:
+            - "dial" for integers in 0..DIAL_MAX_WEIGHT, when the buckets are
+              no more numerous than the edges (so scanning them is cheap),
+            - "radix" for other non-negative integers,
+            - "heap" otherwise (negative or fractional weights, or no edges).
+        """
+        if not self.num_weights or not self.integral or self.min_weight < 0:
+            return "heap"
+        if self.max_weight <= min(DIAL_MAX_WEIGHT, self.num_weights):
+            return "dial"
+        return "radix"
+
+    def __repr__(self):
+        return "WeightStats(|weights|={}, min={}, max={}, integral={})".format(
+               self.num_weights, self.min_weight, self.max_weight,
+               self.integral)
+
+
+class RadixHeap:
+    """
+    Monotone priority-queue of entries (key, item) with non-negative integer
+    keys: a key pushed must never be smaller than the last key popped (which
+    holds in Dijkstra's algorithm). Bucket i holds the entries whose key
+    differs from the last key popped in its highest bit i-1 (bucket 0: equal).
+    When bucket 0 is empty, the first non-empty bucket is redistributed
+    around its smallest key, into lower buckets.
+    """
+    def __init__(self):
+        self._buckets = [[]]
+        self._last = 0 # last key popped
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def push(self, key, item):
+        if key < self._last:
+            raise ValueError("Key {} is smaller than the last key popped {}"
+                             .format(key, self._last))
+        i = (key ^ self._last).bit_length()
+        buckets = self._buckets
+        while len(buckets) <= i:
+            buckets.append([])
+        buckets[i].append((key, item))
+        self._size += 1
+
+    def pop(self):
+        """
+        Removes and returns the entry (key, item) with the smallest key.
+        """
+        if not self._size:
+            raise IndexError("pop from an empty RadixHeap")
+        buckets = self._buckets
+        if not buckets[0]:
+            i = 1
+            while not buckets[i]:
+                i += 1
+            bucket = buckets[i]
+            buckets[i] = []
+            last = self._last = min(key for (key, item) in bucket)
+            for entry in bucket:
+                buckets[(entry[0] ^ last).bit_length()].append(entry)
+        self._size -= 1
+        return buckets[0].pop()
+
+
+def dial_shortest_distances(adjacency, src, max_weight):
+    """
+    Dijkstra's algorithm from src, with Dial's buckets: the weights must be
+    integers in 0..max_weight, so the tentative distances of the frontier
+    always fit in max_weight+1 consecutive values, and bucket d % (max_weight
+    + 1) holds the vertices at tentative distance d. A vertex is pushed again
+    when its distance decreases; outdated entries are skipped when popped.
+    Returns the result as a dictionary (vertex => distance).
+    """
+    numBuckets = max_weight + 1
+    buckets = [None] * numBuckets
+    buckets[0] = [src]
+    distances = {src: 0}
+    pending = 1 # number of entries in the buckets
+    dist = slot = 0
+    while pending:
+        bucket = buckets[slot]
+        while bucket:
+            v = bucket.pop()
+            pending -= 1
+            if distances[v] != dist:
+                continue # outdated entry
+            for w, weight in adjacency[v]:
+                d = dist + weight
+                old = distances.get(w)
+                if old is None or d < old:
+                    distances[w] = d
+                    i = d % numBuckets
+                    if buckets[i] is None:
+                        buckets[i] = [w]
+                    else:
+                        buckets[i].append(w)
+                    pending += 1
+        dist += 1
+        slot += 1
+        if slot == numBuckets:
+            slot = 0
+    return distances
+
+
+def radix_shortest_distances(adjacency, src):
+    """
+    Dijkstra's algorithm from src, with a RadixHeap: the weights must be
+    non-negative integers.
+    Returns the result as a dictionary (vertex => distance).
+    """
+    frontier = RadixHeap()
+    push, pop = frontier.push, frontier.pop
+    distances = {src: 0}
+    push(0, src)
+    while frontier._size:
+        dist, v = pop()
+        if distances[v] != dist:
+            continue # outdated entry
+        for w, weight in adjacency[v]:
+            d = dist + weight
+            old = distances.get(w)
+            if old is None or d < old:
+                distances[w] = d
+                push(d, w)
+    return distances
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Union-find (disjoint-set) data-structures, stored in compact integer arrays.
+Uses union-by-size and path-halving, so that any sequence of operations runs
+in near-linear time.
+    - DenseUnionFind: for elements labeled by contiguous integers.
+    - UnionFind: for elements with arbitrary (hashable) labels.
+"""
+from array import array
+from itertools import izip
+
+class DenseUnionFind:
+    def __init__(self, n=0, first=0):
+        """
+        Initialize a union-find universe with the n elements labeled
+        first, first+1, ..., first+n-1, each in a separate set.
+        """
+        self._parent = array("l", xrange(n)) # element-index => parent-index
+        self._size = array("l", [1]) * n     # root-index => size of its set
+        self._first = first
+        self.num_disjoint_sets = n
+
+    def __len__(self):
+        return len(self._parent)
+
+    def _add(self):
+        """
+        Adds a new singleton set. Returns the index of its element.
+        """
+        i = len(self._parent)
+        self._parent.append(i)
+        self._size.append(1)
+        self.num_disjoint_sets += 1
+        return i
+
+    def _find(self, i):
+        """
+        Returns the index of the root of the set containing element-index i.
+        """
+        parent = self._parent
+        p = parent[i]
+        while p != i:
+            # Path-halving: point i to its grandparent
+            gp = parent[p]
+            parent[i] = gp
+            i = p
+            p = parent[i]
+        return i
+
+    def _union(self, i, j):
+        """
+        Merges the sets containing element-indexes i and j.
+        Returns True if they were in different sets.
+        """
+        i = self._find(i)
+        j = self._find(j)
+        if i == j:
+            return False
+        size = self._size
+        if size[i] < size[j]:
+            i, j = j, i
+        self._parent[j] = i
+        size[i] += size[j]
+        self.num_disjoint_sets -= 1
+        return True
+
+    def add_singleton(self, v):
+        """
+        Add the element v (the next label after the current ones) as a
+        separate set.
+        """
+        if v != self._first + len(self._parent):
+            raise ValueError("Element {} is not the next label".format(v,))
+        self._add()
+
+    def find_root(self, v):
+        """
+        Returns the label of the root of the set containing the element v.
+        """
+        return self._find(v - self._first) + self._first
+
+    def union(self, v, w):
+        """
+        Merges the sets containing the elements v and w.
+        Returns True if they were in different sets.
+        """
+        return self._union(v - self._first, w - self._first)
+
+    def connected(self, v, w):
+        """
+        Returns True if the elements v and w are in the same set.
+        """
+        return self._find(v - self._first) == self._find(w - self._first)
+
+    def set_size(self, v):
+        """
+        Returns the size of the set containing the element v.
+        """
+        return self._size[self._find(v - self._first)]
+
+    def union_many(self, vertices1, vertices2):
+        """
+        Merges the sets of vertices1[i] and vertices2[i] for every i
+        (e.g. the endpoints of an array of edges).
+        Returns the number of merges, i.e. the pairs that were in different
+        sets.
+        """
+        first = self._first
+        parent = self._parent
+        size = self._size
+        merges = 0
+        for v, w in izip(vertices1, vertices2):
+            i = v - first
+            p = parent[i]
+            while p != i:
+                gp = parent[p]
+                parent[i] = gp
+                i = p
+                p = parent[i]
+            j = w - first
+            p = parent[j]
+            while p != j:
+                gp = parent[p]
+                parent[j] = gp
+                j = p
+                p = parent[j]
+            if i == j:
+                continue
+            if size[i] < size[j]:
+                i, j = j, i
+            parent[j] = i
+            size[i] += size[j]
+            merges += 1
+        self.num_disjoint_sets -= merges
+        return merges
+
+    def __repr__(self):
+        return "{}(|elements|={}, |sets|={})".format(self.__class__.__name__,
+                                                     len(self),
+                                                     self.num_disjoint_sets)
+
+
+class UnionFind(DenseUnionFind):
+    def __init__(self, elements=()):
+        """
+        Initialize a union-find universe with each of the specified elements
+        in a separate set.
+        """
+        DenseUnionFind.__init__(self)
+        self._index = {} # element => element-index
+        self._labels = [] # element-index => element
+        for v in elements:
+            self.add_singleton(v)
+
+    def add_singleton(self, v):
+        """
+        Add the element v as a separate set, if it isn't already present.
+        """
+        if v in self._index:
+            return
+        self._index[v] = self._add()
+        self._labels.append(v)
+
+    def find_root(self, v):
+        """
+        Returns the root element of the set containing the element v.
+        """
+        return self._labels[self._find(self._index[v])]
+
+    def union(self, v, w):
+        """
+        Merges the sets containing the elements v and w.
+        Returns True if they were in different sets.
+        """
+        return self._union(self._index[v], self._index[w])
+
+    def connected(self, v, w):
+        """
+        Returns True if the elements v and w are in the same set.
+        """
+        return self._find(self._index[v]) == self._find(self._index[w])
+
+    def set_size(self, v):
+        """
+        Returns the size of the set containing the element v.
+        """
+        return self._size[self._find(self._index[v])]
+
+    def union_many(self, vertices1, vertices2):
+        """
+        Merges the sets of vertices1[i] and vertices2[i] for every i.
+        Returns the number of merges.
+        """
+        index = self._index
+        union = self._union
+        merges = 0
+        for v, w in izip(vertices1, vertices2):
+            if union(index[v], index[w]):
+                merges += 1
+        return merges
+
+    def __contains__(self, v):
+        return v in self._index